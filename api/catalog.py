@@ -1,6 +1,5 @@
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-import json
 import sys
 import os
 
@@ -8,18 +7,46 @@ import os
 try:
     from api.utils import (
         load_cache,
+        load_catalog_meta,
+        load_catalog_response,
+        load_catalog_page,
+        load_catalog_slice,
+        load_compressed_catalog_page,
+        catalog_memory_cache,
+        CATALOG_PAGE_SIZE,
+        negotiate_encoding,
+        encode_response,
+        make_etag,
+        is_not_modified,
+        format_http_date,
+        get_cache_control,
         to_stremio_meta,
         get_enabled_languages,
         parse_catalog_id,
+        json_dumps,
     )
 except ImportError:
     # Add parent directory to path
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from api.utils import (
         load_cache,
+        load_catalog_meta,
+        load_catalog_response,
+        load_catalog_page,
+        load_catalog_slice,
+        load_compressed_catalog_page,
+        catalog_memory_cache,
+        CATALOG_PAGE_SIZE,
+        negotiate_encoding,
+        encode_response,
+        make_etag,
+        is_not_modified,
+        format_http_date,
+        get_cache_control,
         to_stremio_meta,
         get_enabled_languages,
         parse_catalog_id,
+        json_dumps,
     )
 
 class handler(BaseHTTPRequestHandler):
@@ -28,20 +55,31 @@ class handler(BaseHTTPRequestHandler):
         parsed_url = urlparse(self.path)
         query_params = parse_qs(parsed_url.query)
         catalog_id = query_params.get('id', [None])[0] or query_params.get('lang', [None])[0]
+        try:
+            skip = max(0, int(query_params['skip'][0])) if 'skip' in query_params else None
+        except ValueError:
+            skip = None
 
         if not catalog_id:
-            path_parts = self.path.split('/')
+            # /catalog/movie/<id>.json or /catalog/movie/<id>/skip=<n>.json
+            path_parts = parsed_url.path.split('/')
             if 'movie' in path_parts:
                 idx = path_parts.index('movie')
                 if idx + 1 < len(path_parts):
                     catalog_id = path_parts[idx + 1].replace('.json', '')
+                if idx + 2 < len(path_parts) and skip is None:
+                    extra = parse_qs(path_parts[idx + 2].replace('.json', ''))
+                    try:
+                        skip = max(0, int(extra['skip'][0])) if 'skip' in extra else None
+                    except ValueError:
+                        skip = None
 
         if not catalog_id:
             self.send_response(400)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps({"metas": [], "error": "missing_catalog_id"}).encode())
+            self.wfile.write(json_dumps({"metas": [], "error": "missing_catalog_id"}))
             return
 
         lang, token = parse_catalog_id(catalog_id)
@@ -52,19 +90,136 @@ class handler(BaseHTTPRequestHandler):
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps({"metas": []}).encode())
+            self.wfile.write(json_dumps({"metas": []}))
             return
 
         print(f"[INFO] Catalog requested for {lang} (token: {token[:20] if token else 'none'}...)")
 
         try:
-            from api.utils import get_tmdb_key, fetch_movies_for_language, save_cache
+            from api.utils import (
+                get_tmdb_key, fetch_catalog_once, catalog_is_stale, refresh_in_background,
+            )
             
+            cache_control = get_cache_control('catalog')
+            catalog_meta = load_catalog_meta(lang)
+            if catalog_meta and catalog_is_stale(catalog_meta, lang):
+                # Serve the stale catalog now; a background refresh replaces it
+                cache_control = get_cache_control('catalog_stale')
+                if refresh_in_background(lang, get_tmdb_key(token)):
+                    print(f"[INFO] Catalog for {lang} is stale, refreshing in the background")
+
+            # Catalogs are served in pages of CATALOG_PAGE_SIZE metas, the
+            # first one to requests without skip
+            paginated = skip is not None or CATALOG_PAGE_SIZE > 0
+            limit = CATALOG_PAGE_SIZE or None
+            skip = skip or 0
+
+            # Whole catalogs get the pre-serialized response written by the
+            # last refresh, pre-compressed if the client accepts it
+            if catalog_meta and not paginated:
+                encoding = negotiate_encoding(
+                    self.headers.get('Accept-Encoding'), catalog_meta.get("encodings", [])
+                )
+                etag = make_etag(catalog_meta["digest"], encoding)
+                last_modified = catalog_meta["last_modified"]
+
+                if is_not_modified(self.headers, etag, last_modified):
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Last-Modified', format_http_date(last_modified))
+                    self.send_header('Cache-Control', cache_control)
+                    self.send_header('Vary', 'Accept-Encoding')
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    print(f"[INFO] Catalog for {lang} not modified ✅")
+                    return
+
+                body = load_catalog_response(lang, encoding)
+                if body is not None:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    if encoding:
+                        self.send_header('Content-Encoding', encoding)
+                    self.send_header('ETag', etag)
+                    self.send_header('Last-Modified', format_http_date(last_modified))
+                    self.send_header('Cache-Control', cache_control)
+                    self.send_header('Vary', 'Accept-Encoding')
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(body)
+                    cache_stats = catalog_memory_cache.stats()
+                    print(f"[INFO] Served pre-serialized catalog for {lang} ({len(body)} bytes, {encoding or 'identity'}, "
+                          f"memory cache {cache_stats['hits']} hits / {cache_stats['misses']} misses) ✅")
+                    return
+
+            # Pages are sent as pre-compressed by the last refresh, or sliced
+            # out of the memory-mapped catalog index, at the same cost however
+            # deep they are
+            if paginated:
+                accept_encoding = self.headers.get('Accept-Encoding')
+                encoding = negotiate_encoding(accept_encoding)
+                etag = last_modified = None
+                if catalog_meta:
+                    etag = make_etag(f"{catalog_meta['digest']}-{skip}-{limit or 0}", encoding)
+                    last_modified = catalog_meta["last_modified"]
+                    if is_not_modified(self.headers, etag, last_modified):
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.send_header('Last-Modified', format_http_date(last_modified))
+                        self.send_header('Cache-Control', cache_control)
+                        self.send_header('Vary', 'Accept-Encoding')
+                        self.send_header('Access-Control-Allow-Origin', '*')
+                        self.end_headers()
+                        print(f"[INFO] Catalog page for {lang} not modified (skip {skip}) ✅")
+                        return
+
+                body = None
+                if catalog_meta and encoding:
+                    body = load_compressed_catalog_page(lang, catalog_meta, skip, limit, encoding)
+                if body is None:
+                    # Pages off the refresh's page boundaries are compressed here
+                    body = load_catalog_slice(lang, skip, limit)
+                    if body is not None:
+                        body, encoding = encode_response(body, accept_encoding)
+                if body is not None:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    if encoding:
+                        self.send_header('Content-Encoding', encoding)
+                    if etag:
+                        self.send_header('ETag', etag)
+                        self.send_header('Last-Modified', format_http_date(last_modified))
+                    self.send_header('Cache-Control', cache_control)
+                    self.send_header('Vary', 'Accept-Encoding')
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    self.wfile.write(body)
+                    print(f"[INFO] Served catalog page for {lang} from the catalog index "
+                          f"(skip {skip}, {len(body)} bytes, {encoding or 'identity'}) ✅")
+                    return
+
+            # Until the index or the pre-serialized response exists, the
+            # movie store is queried instead
+            metas = load_catalog_page(lang, skip, limit)
+            if metas is not None:
+                print(f"[INFO] Returning {len(metas)} movies for {lang} from the movie store (skip {skip}) ✅")
+                self.send_metas(metas, cache_control)
+                return
+
             # Try to load from cache
-            cached_movies = load_cache(lang, token)
+            cached_movies = load_cache(lang)
             print(f"[INFO] Loaded {len(cached_movies)} movies from cache for {lang}")
             
-            # If cache is empty, try to fetch (but limit pages to avoid timeout)
+            # Convert to Stremio format
+            metas = []
+            for movie in cached_movies:
+                meta = to_stremio_meta(movie)
+                if meta:
+                    metas.append(meta)
+            
+            # If cache is empty, try to fetch (but limit time to avoid timeout)
             if not cached_movies:
                 print(f"[INFO] Cache empty for {lang}, fetching movies...")
                 tmdb_key = get_tmdb_key(token)
@@ -72,40 +227,32 @@ class handler(BaseHTTPRequestHandler):
                     print(f"[ERROR] No TMDB API key found for {lang}")
                     self.send_response(200)
                     self.send_header('Content-Type', 'application/json')
+                    self.send_header('Cache-Control', 'no-store')
                     self.send_header('Access-Control-Allow-Origin', '*')
                     self.end_headers()
-                    self.wfile.write(json.dumps({"metas": [], "error": "no_api_key"}).encode())
+                    self.wfile.write(json_dumps({"metas": [], "error": "no_api_key"}))
                     return
                 
                 try:
-                    # Fetch movies (this might timeout on first request, that's ok)
-                    # User should trigger /refresh endpoint to populate cache
-                    print(f"[INFO] Starting fetch for {lang}...")
-                    cached_movies = fetch_movies_for_language(lang, tmdb_key)
-                    if cached_movies:
-                        save_cache(lang, cached_movies, token)
-                        print(f"[INFO] Saved {len(cached_movies)} movies to cache for {lang}")
-                    else:
-                        print(f"[WARNING] Fetch returned no movies for {lang}")
+                    # Concurrent requests share one time-budgeted crawl and
+                    # are served what it confirmed; only a complete crawl is
+                    # cached. User should trigger /refresh endpoint to populate cache
+                    metas, complete = fetch_catalog_once(lang, tmdb_key)
+                    if not complete:
+                        # Partial or empty results must not outlive this
+                        # request; finish the crawl in the background
+                        cache_control = 'no-store'
+                        refresh_in_background(lang, tmdb_key)
                 except Exception as e:
                     import traceback
                     print(f"[ERROR] Failed to fetch movies for {lang}: {traceback.format_exc()}")
+                    cache_control = 'no-store'
                     # Return empty instead of failing - user can refresh manually
             
-            # Convert to Stremio format
-            metas = []
-            for movie in cached_movies:
-                meta = to_stremio_meta(movie)
-                if meta:
-                    metas.append(meta)
+            metas = metas[skip:skip + limit] if limit else metas[skip:]
             
             print(f"[INFO] Returning {len(metas)} total movies for {lang} ✅")
-            
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps({"metas": metas}).encode())
+            self.send_metas(metas, cache_control)
         except Exception as e:
             import traceback
             error_msg = traceback.format_exc()
@@ -113,8 +260,18 @@ class handler(BaseHTTPRequestHandler):
             # Always return valid JSON, even on error
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'no-store')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps({"metas": []}).encode())
+            self.wfile.write(json_dumps({"metas": []}))
         return
 
+    def send_metas(self, metas, cache_control):
+        """Send a catalog response built per request"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json_dumps({"metas": metas}))
+
@@ -13,6 +13,8 @@ try:
         encode_config_token,
         decode_config_token,
         build_catalog_id,
+        get_cache_control,
+        json_dumps,
     )
 except ImportError:
     # Add parent directory to path
@@ -24,6 +26,8 @@ except ImportError:
         encode_config_token,
         decode_config_token,
         build_catalog_id,
+        get_cache_control,
+        json_dumps,
     )
 
 CONFIGURE_HTML = """<!DOCTYPE html>
@@ -480,9 +484,10 @@ class handler(BaseHTTPRequestHandler):
                 config_response["token"] = token
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', get_cache_control('configure'))
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(config_response).encode())
+            self.wfile.write(json_dumps(config_response))
             return
         
         # Return HTML configuration page
@@ -507,10 +512,10 @@ class handler(BaseHTTPRequestHandler):
                 self.send_header('Content-Type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                self.wfile.write(json.dumps({
+                self.wfile.write(json_dumps({
                     "status": "error",
                     "message": "TMDB API key is required"
-                }).encode())
+                }))
                 return
             
             if not enabled_languages:
@@ -518,10 +523,10 @@ class handler(BaseHTTPRequestHandler):
                 self.send_header('Content-Type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                self.wfile.write(json.dumps({
+                self.wfile.write(json_dumps({
                     "status": "error",
                     "message": "At least one language must be selected"
-                }).encode())
+                }))
                 return
             
             # Validate languages
@@ -533,10 +538,10 @@ class handler(BaseHTTPRequestHandler):
                 self.send_header('Content-Type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                self.wfile.write(json.dumps({
+                self.wfile.write(json_dumps({
                     "status": "error",
                     "message": "Invalid language selection"
-                }).encode())
+                }))
                 return
             
             # Save configuration
@@ -574,7 +579,7 @@ class handler(BaseHTTPRequestHandler):
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps({
+            self.wfile.write(json_dumps({
                 "status": "success",
                 "message": "Configuration saved successfully. To populate the catalog, visit /refresh?token=YOUR_TOKEN or wait for the catalog to auto-populate on first access.",
                 "token": token,
@@ -583,15 +588,15 @@ class handler(BaseHTTPRequestHandler):
                 "stremio_web_link": stremio_web_link,
                 "catalog_urls": catalog_urls,
                 "enabled_languages": enabled_languages
-            }).encode())
+            }))
         except Exception as e:
             self.send_response(500)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps({
+            self.wfile.write(json_dumps({
                 "status": "error",
                 "message": str(e)
-            }).encode())
+            }))
         return
 
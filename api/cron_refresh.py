@@ -1,20 +1,19 @@
 from http.server import BaseHTTPRequestHandler
-import json
 import sys
 import os
 
 # Import utils - try different paths for Vercel compatibility
 try:
     from api.utils import (
-        get_tmdb_key, get_enabled_languages, 
-        fetch_movies_for_language, save_cache
+        get_tmdb_key, get_enabled_languages,
+        refresh_languages, REFRESH_BUDGET_SECONDS, json_dumps,
     )
 except ImportError:
     # Add parent directory to path
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from api.utils import (
-        get_tmdb_key, get_enabled_languages, 
-        fetch_movies_for_language, save_cache
+        get_tmdb_key, get_enabled_languages,
+        refresh_languages, REFRESH_BUDGET_SECONDS, json_dumps,
     )
 
 class handler(BaseHTTPRequestHandler):
@@ -24,30 +23,41 @@ class handler(BaseHTTPRequestHandler):
             print("[CRON] TMDB API key not configured, skipping refresh")
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'no-store')
             self.end_headers()
-            self.wfile.write(json.dumps({"status": "skipped - no api key"}).encode())
+            self.wfile.write(json_dumps({"status": "skipped - no api key"}))
             return
         
         enabled_languages = get_enabled_languages()
         
         try:
-            for lang in enabled_languages:
-                print(f"[CRON] Auto-refreshing {lang}...")
-                movies = fetch_movies_for_language(lang, tmdb_key)
-                save_cache(lang, movies)
-            print("[CRON] Auto-refresh complete ✅")
+            print(f"[CRON] Auto-refreshing {', '.join(enabled_languages)}...")
+            result = refresh_languages(enabled_languages, tmdb_key, budget=REFRESH_BUDGET_SECONDS)
+            if result["status"] == "complete":
+                print("[CRON] Auto-refresh complete ✅")
+                status = "success"
+            else:
+                # The checkpoint is picked up by the next cron run or /refresh call
+                print(f"[CRON] Time budget used up, pending: {', '.join(result['pending'])}")
+                status = "partial"
             
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'no-store')
             self.end_headers()
-            self.wfile.write(json.dumps({"status": "success"}).encode())
+            self.wfile.write(json_dumps({
+                "status": status,
+                "completed": result["completed"],
+                "pending": result["pending"]
+            }))
         except Exception as e:
             import traceback
             error_msg = traceback.format_exc()
             print(f"[CRON ERROR] {error_msg}")
             self.send_response(500)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'no-store')
             self.end_headers()
-            self.wfile.write(json.dumps({"status": "error", "message": str(e)}).encode())
+            self.wfile.write(json_dumps({"status": "error", "message": str(e)}))
         return
 
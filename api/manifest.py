@@ -1,5 +1,6 @@
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
+import hashlib
 import json
 import sys
 import os
@@ -11,6 +12,13 @@ try:
         LANGUAGE_NAMES,
         build_catalog_id,
         load_config,
+        encode_response,
+        negotiate_encoding,
+        make_etag,
+        is_not_modified,
+        get_cache_control,
+        json_dumps,
+        CATALOG_PAGE_SIZE,
     )
 except ImportError:
     # Add parent directory to path
@@ -21,6 +29,13 @@ except ImportError:
             LANGUAGE_NAMES,
             build_catalog_id,
             load_config,
+            encode_response,
+            negotiate_encoding,
+            make_etag,
+            is_not_modified,
+            get_cache_control,
+            json_dumps,
+            CATALOG_PAGE_SIZE,
         )
     except ImportError as e:
         print(f"[ERROR] Failed to import utils: {e}")
@@ -32,6 +47,19 @@ except ImportError:
             return f"{lang}~{token}" if token else lang
         def load_config(token):
             return {"enabled_languages": ["malayalam"]}
+        def encode_response(body, accept_encoding):
+            return body, None
+        def negotiate_encoding(accept_encoding, available=None):
+            return None
+        def make_etag(digest, encoding=None):
+            return f'"{digest}"'
+        def is_not_modified(request_headers, etag, last_modified=None):
+            return False
+        def get_cache_control(endpoint):
+            return "no-store"
+        def json_dumps(value):
+            return json.dumps(value, separators=(',', ':')).encode('utf-8')
+        CATALOG_PAGE_SIZE = 0
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -95,6 +123,12 @@ class handler(BaseHTTPRequestHandler):
                     "name": "Malayalam"
                 }]
 
+            # Stremio then requests further pages as
+            # /catalog/movie/<id>/skip=<n>.json while scrolling
+            if CATALOG_PAGE_SIZE:
+                for catalog in catalogs:
+                    catalog["extra"] = [{"name": "skip", "isRequired": False}]
+
             if token:
                 manifest_id = f"org.indian.catalog.{token[:8]}"
             else:
@@ -111,16 +145,42 @@ class handler(BaseHTTPRequestHandler):
                 "idPrefixes": ["tt"]
             }
 
-            manifest_json = json.dumps(manifest, indent=None, separators=(',', ':'))
+            manifest_body = json_dumps(manifest)
             print(f"[MANIFEST] Sending manifest with {len(catalogs)} catalogs")
+
+            # The body follows the stored config and the environment, which
+            # have no modification time of their own; only the ETag is sent
+            accept_encoding = self.headers.get('Accept-Encoding')
+            etag = make_etag(
+                hashlib.sha1(manifest_body).hexdigest()[:20], negotiate_encoding(accept_encoding)
+            )
+
+            if is_not_modified(self.headers, etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', get_cache_control('manifest'))
+                self.send_header('Vary', 'Accept-Encoding')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                print(f"[MANIFEST] Manifest not modified")
+                return
+
+            # Compressed variants are memoized per manifest body
+            body, encoding = encode_response(manifest_body, accept_encoding)
             
             self.send_response(200)
             self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', get_cache_control('manifest'))
+            self.send_header('Vary', 'Accept-Encoding')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', '*')
             self.end_headers()
-            self.wfile.write(manifest_json.encode('utf-8'))
+            self.wfile.write(body)
             self.wfile.flush()
         except Exception as e:
             import traceback
@@ -145,6 +205,7 @@ class handler(BaseHTTPRequestHandler):
                 error_json = json.dumps(error_manifest, indent=None, separators=(',', ':'))
                 self.send_response(200)
                 self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Cache-Control', 'no-store')
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
                 self.send_header('Access-Control-Allow-Headers', '*')
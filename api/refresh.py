@@ -1,21 +1,20 @@
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-import json
 import sys
 import os
 
 # Import utils - try different paths for Vercel compatibility
 try:
     from api.utils import (
-        get_tmdb_key, get_enabled_languages, 
-        fetch_movies_for_language, save_cache
+        get_tmdb_key, get_enabled_languages,
+        refresh_languages, REFRESH_BUDGET_SECONDS, json_dumps,
     )
 except ImportError:
     # Add parent directory to path
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from api.utils import (
-        get_tmdb_key, get_enabled_languages, 
-        fetch_movies_for_language, save_cache
+        get_tmdb_key, get_enabled_languages,
+        refresh_languages, REFRESH_BUDGET_SECONDS, json_dumps,
     )
 
 class handler(BaseHTTPRequestHandler):
@@ -23,46 +22,63 @@ class handler(BaseHTTPRequestHandler):
         parsed_url = urlparse(self.path)
         query_params = parse_qs(parsed_url.query)
         token = query_params.get('token', [None])[0]
+        mode = query_params.get('mode', ['auto'])[0]
+        try:
+            budget = int(query_params.get('budget', [REFRESH_BUDGET_SECONDS])[0])
+        except ValueError:
+            budget = REFRESH_BUDGET_SECONDS
 
         tmdb_key = get_tmdb_key(token)
         if not tmdb_key:
             self.send_response(400)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'no-store')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps({
+            self.wfile.write(json_dumps({
                 "status": "error",
                 "message": "TMDB API key not configured"
-            }).encode())
+            }))
             return
         
         enabled_languages = get_enabled_languages(token)
         
         def do_refresh():
             try:
-                for lang in enabled_languages:
-                    print(f"[REFRESH] Refreshing {lang}...")
-                    movies = fetch_movies_for_language(lang, tmdb_key)
-                    save_cache(lang, movies, token)
-                print("[REFRESH] Background refresh complete ✅")
+                print(f"[REFRESH] Refreshing {', '.join(enabled_languages)}...")
+                result = refresh_languages(enabled_languages, tmdb_key, mode, budget)
+                if result["status"] == "complete":
+                    print("[REFRESH] Background refresh complete ✅")
+                else:
+                    print(f"[REFRESH] Time budget used up, pending: {', '.join(result['pending'])}")
+                return result
             except Exception as e:
                 import traceback
                 print(f"[REFRESH ERROR] {traceback.format_exc()}")
+                raise
         
         # Run refresh in background (for Vercel, this will complete before response)
+        result = None
         try:
-            do_refresh()
-            status = "refresh completed"
+            result = do_refresh()
+            if result["status"] == "complete":
+                status = "refresh completed"
+            else:
+                status = "refresh partial - call /refresh again to resume"
         except Exception as e:
             status = f"refresh error: {str(e)}"
         
         self.send_response(200)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', 'no-store')
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
         response = {"status": status}
+        if result:
+            response["completed"] = result["completed"]
+            response["pending"] = result["pending"]
         if token:
             response["token"] = token
-        self.wfile.write(json.dumps(response).encode())
+        self.wfile.write(json_dumps(response))
         return
 
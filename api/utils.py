@@ -1,13 +1,53 @@
+import asyncio
 import base64
+import gzip
 import hashlib
 import json
+import mmap
 import os
-from datetime import datetime
+import random
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from itertools import islice
 from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
 
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
 
 # Language codes mapping
 LANGUAGE_CODES = {
@@ -27,6 +67,299 @@ LANGUAGE_NAMES = {
 CATALOG_ID_SEPARATOR = "~"
 
 
+def _env_int(name, default, minimum=1):
+    """Read an integer setting (at least ``minimum``) from the environment"""
+    try:
+        value = int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value >= minimum else default
+
+
+def _env_bool(name, default=False):
+    """Read a boolean flag from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Maximum number of TMDB requests in flight during a refresh
+TMDB_CONCURRENCY = _env_int("TMDB_CONCURRENCY", 16)
+
+# Maximum number of discover pages fetched (and enriched) at the same time
+TMDB_PAGE_WINDOW = _env_int("TMDB_PAGE_WINDOW", 8)
+
+# TMDB rejects discover pages beyond this number
+TMDB_MAX_PAGES = 500
+
+# How per-movie details are fetched: "append" uses a single
+# /movie/{id}?append_to_response=... call, "separate" uses the dedicated
+# watch/providers and external_ids endpoints (two round trips)
+ENRICHMENT_MODES = ("append", "separate")
+TMDB_ENRICHMENT_MODE = os.getenv("TMDB_ENRICHMENT_MODE", "append")
+if TMDB_ENRICHMENT_MODE not in ENRICHMENT_MODES:
+    TMDB_ENRICHMENT_MODE = "append"
+
+
+# HTTP connection pooling: number of per-host pools kept, connections kept
+# alive per host (requests beyond it wait for a free connection) and
+# connect/read timeouts in seconds
+HTTP_POOL_CONNECTIONS = _env_int("HTTP_POOL_CONNECTIONS", 4)
+HTTP_POOL_MAXSIZE = _env_int("HTTP_POOL_MAXSIZE", max(TMDB_CONCURRENCY, 10))
+HTTP_CONNECT_TIMEOUT = _env_int("HTTP_CONNECT_TIMEOUT", 5)
+HTTP_READ_TIMEOUT = _env_int("HTTP_READ_TIMEOUT", 30)
+
+_http_session = None
+_http_session_lock = threading.Lock()
+_http_requests_sent = 0
+
+
+def get_http_session():
+    """Return the process-wide pooled session used for all TMDB traffic.
+
+    The session lives at module level so keep-alive connections are reused
+    across pages, movies, languages and warm serverless invocations.
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    pool_block=True,
+                    max_retries=0,  # retries are handled by tmdb_request
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def get_http_stats():
+    """Connection reuse counters for the pooled session"""
+    stats = {"requests": _http_requests_sent, "connections_opened": 0, "pool_requests": 0}
+    if _http_session is not None:
+        for adapter in set(_http_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats["connections_opened"] += pool.num_connections
+                stats["pool_requests"] += pool.num_requests
+    stats["connections_reused"] = max(0, stats["pool_requests"] - stats["connections_opened"])
+    return stats
+
+
+# Process-wide TMDB request budget, in requests per second
+TMDB_RATE_LIMIT = _env_int("TMDB_RATE_LIMIT", 40)
+
+# Retries for throttled (429), 5xx and failed TMDB requests
+TMDB_MAX_RETRIES = _env_int("TMDB_MAX_RETRIES", 5)
+
+# Upper bound for a single backoff sleep, in seconds
+TMDB_MAX_BACKOFF = 30
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate of the whole process.
+
+    ``pause`` blocks every caller for a while, which is how a ``Retry-After``
+    from one throttled request slows down all the others.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back all requests for ``seconds``"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # Refill only from the end of the pause, so waiting callers are
+            # released at ``rate`` rather than all at once
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+
+tmdb_rate_limiter = TokenBucket(TMDB_RATE_LIMIT)
+
+
+def _retry_after_seconds(response):
+    """Parse a Retry-After header (delta-seconds or HTTP date)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_seconds(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(TMDB_MAX_BACKOFF, 0.5 * 2 ** attempt))
+
+
+def tmdb_request(path, params, tmdb_key):
+    """GET a TMDB API path through the shared rate limiter.
+
+    Throttled (429) responses wait for ``Retry-After`` and 5xx responses or
+    connection errors back off with jitter, up to ``TMDB_MAX_RETRIES``
+    retries. Returns the last response; raises if the last attempt failed
+    with an exception.
+    """
+    global _http_requests_sent
+    session = get_http_session()
+    url = f"{TMDB_BASE_URL}{path}"
+    params = {"api_key": tmdb_key, **params}
+    for attempt in range(TMDB_MAX_RETRIES + 1):
+        tmdb_rate_limiter.acquire()
+        with _http_session_lock:
+            _http_requests_sent += 1
+        try:
+            response = session.get(
+                url, params=params, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+            )
+        except requests.RequestException as e:
+            if attempt == TMDB_MAX_RETRIES:
+                raise
+            delay = _backoff_seconds(attempt)
+            print(f"[WARNING] TMDB request {path} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if response.status_code == 429:
+            if attempt == TMDB_MAX_RETRIES:
+                return response
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                delay = min(TMDB_MAX_BACKOFF, retry_after) + random.uniform(0, 0.5)
+            else:
+                delay = _backoff_seconds(attempt)
+            print(f"[WARNING] TMDB throttled {path}, retrying in {delay:.1f}s")
+            tmdb_rate_limiter.pause(delay)
+            continue
+
+        if response.status_code >= 500 and attempt < TMDB_MAX_RETRIES:
+            delay = _backoff_seconds(attempt)
+            print(f"[WARNING] TMDB error {response.status_code} on {path}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        return response
+
+
+# Region whose streaming (flatrate) offers decide catalog membership
+WATCH_REGION = "IN"
+
+# How discover is queried: "ott" lets TMDB filter on IN flatrate offers
+# (watch_region + with_watch_monetization_types), "all" returns every
+# release and leaves OTT filtering to the per-movie providers check
+DISCOVER_MODES = ("ott", "all")
+TMDB_DISCOVER_MODE = os.getenv("TMDB_DISCOVER_MODE", "ott")
+if TMDB_DISCOVER_MODE not in DISCOVER_MODES:
+    TMDB_DISCOVER_MODE = "ott"
+
+# Optional provider allow-list for "ott" discover, e.g. "8|119|122"
+# (TMDB watch provider IDs, "|" means OR)
+TMDB_WATCH_PROVIDERS = os.getenv("TMDB_WATCH_PROVIDERS", "").strip()
+
+# Re-check providers per movie even when discover already filtered on them
+TMDB_VERIFY_PROVIDERS = _env_bool("TMDB_VERIFY_PROVIDERS")
+
+
+# How long cached watch-provider data for a movie stays valid
+PROVIDERS_CACHE_TTL = _env_int("PROVIDERS_CACHE_TTL_HOURS", 12) * 3600
+
+# Enrichment entries not used by any crawl for this long are dropped
+ENRICHMENT_CACHE_MAX_AGE = _env_int("ENRICHMENT_CACHE_MAX_AGE_DAYS", 90) * 86400
+
+# How long a crawl waits for another one to finish updating a shared cache
+SHARED_CACHE_LOCK_TIMEOUT = 10
+
+
+# Refresh modes for refresh_language
+REFRESH_MODES = ("auto", "full", "incremental")
+
+# How far behind the previous frontier an incremental refresh re-checks,
+# to catch late TMDB additions and titles that only just started streaming
+INCREMENTAL_OVERLAP_DAYS = _env_int("INCREMENTAL_OVERLAP_DAYS", 14)
+
+# How often "auto" refreshes fall back to a full re-validation crawl
+FULL_REFRESH_INTERVAL = _env_int("FULL_REFRESH_INTERVAL_DAYS", 7) * 86400
+
+# Wall-clock budget of a refresh invocation in seconds (0 = unlimited) and
+# the time kept in reserve for saving results before the platform timeout
+REFRESH_BUDGET_SECONDS = _env_int("REFRESH_BUDGET_SECONDS", 50, minimum=0)
+REFRESH_DEADLINE_MARGIN = 5
+
+# Time a catalog request may spend crawling TMDB when its cache is empty
+CATALOG_FETCH_BUDGET_SECONDS = _env_int("CATALOG_FETCH_BUDGET_SECONDS", 8)
+
+# How often requests waiting on another request's cold fetch check for its
+# result, and how long past the fetch budget its lease is honoured
+COLD_FETCH_POLL_INTERVAL = 0.25
+COLD_FETCH_LEASE_MARGIN = 5
+
+# Catalogs last refreshed longer ago than this are served stale while a
+# background refresh replaces them; CATALOG_TTL_HOURS_<LANGUAGE> (e.g.
+# CATALOG_TTL_HOURS_HINDI) overrides it for one language
+CATALOG_TTL = _env_int("CATALOG_TTL_HOURS", 24) * 3600
+CATALOG_TTLS = {
+    language: _env_int(f"CATALOG_TTL_HOURS_{language.upper()}", CATALOG_TTL // 3600) * 3600
+    for language in LANGUAGE_CODES
+}
+
+# Checkpoints older than this are discarded and the refresh starts over
+REFRESH_CHECKPOINT_MAX_AGE = 86400
+
+# How often a running refresh checkpoints its progress, in seconds
+REFRESH_PROGRESS_INTERVAL = _env_int("REFRESH_PROGRESS_INTERVAL_SECONDS", 5)
+
+# Re-check intervals for rejected titles, by age of the release:
+# (max release age in days, re-check after days); None matches any age
+NEGATIVE_CACHE_TIERS = (
+    (30, 1),
+    (365, 7),
+    (None, 30),
+)
+
+
+def has_flatrate(prov_data, region=WATCH_REGION):
+    """Check whether a watch/providers payload lists a flatrate offer for region"""
+    results = (prov_data or {}).get("results") or {}
+    return "flatrate" in (results.get(region) or {})
+
+
 def build_catalog_id(language, token):
     return f"{language}{CATALOG_ID_SEPARATOR}{token}" if token else language
 
@@ -37,15 +370,615 @@ def parse_catalog_id(catalog_id):
         return lang, token
     return catalog_id, None
 
-def get_config_path():
-    """Get path to config file"""
+
+def _stdlib_json_dumps(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+# JSON codecs as (dumps to bytes, loads from bytes or str), fastest first;
+# JSON_CODEC can force one of the installed ones
+JSON_CODECS = {}
+if orjson is not None:
+    JSON_CODECS["orjson"] = (orjson.dumps, orjson.loads)
+if msgspec is not None:
+    JSON_CODECS["msgspec"] = (msgspec.json.encode, msgspec.json.decode)
+JSON_CODECS["json"] = (_stdlib_json_dumps, json.loads)
+JSON_CODEC = os.getenv("JSON_CODEC", "")
+if JSON_CODEC not in JSON_CODECS:
+    JSON_CODEC = next(iter(JSON_CODECS))
+_json_dumps, _json_loads = JSON_CODECS[JSON_CODEC]
+
+
+def json_dumps(value):
+    """Serialize ``value`` to compact UTF-8 JSON bytes with the selected codec"""
+    return _json_dumps(value)
+
+
+def json_loads(data):
+    """Parse JSON bytes or text with the selected codec"""
+    return _json_loads(data)
+
+
+# File suffixes of pre-compressed response variants, by Content-Encoding
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def available_encodings():
+    """Content encodings we can produce, in order of preference"""
+    return [encoding for encoding in ENCODING_SUFFIXES if encoding != "br" or brotli is not None]
+
+
+# Brotli quality of bodies compressed on the request path rather than at
+# refresh time, trading some ratio for far less CPU
+DYNAMIC_BROTLI_QUALITY = 5
+
+
+def compress_body(body, encoding, brotli_quality=11):
+    """Compress a response body with the given Content-Encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def write_compressed_variants(key, body):
+    """Store pre-compressed variants of ``body`` next to a stored response.
+
+    Returns the encodings that were written.
+    """
+    storage = get_storage()
+    written = []
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        variant_key = key + suffix
+        try:
+            if encoding in available_encodings():
+                storage.write(variant_key, compress_body(body, encoding))
+                written.append(encoding)
+            else:
+                storage.delete(variant_key)
+        except Exception as e:
+            print(f"[WARNING] Could not write {variant_key}: {e}")
+    return written
+
+
+def make_etag(digest, encoding=None):
+    """Strong ETag for one representation (content encoding) of a response"""
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def format_http_date(timestamp):
+    """Format a Unix timestamp as an HTTP date (for Last-Modified)"""
+    return formatdate(timestamp, usegmt=True)
+
+
+def is_not_modified(request_headers, etag, last_modified=None):
+    """Check conditional request headers against the current representation.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``, as in
+    RFC 9110. ``last_modified`` is a Unix timestamp.
+    """
+    if_none_match = request_headers.get('If-None-Match')
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        # If-None-Match uses weak comparison
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+    if_modified_since = request_headers.get('If-Modified-Since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return int(last_modified) <= since.timestamp()
+    return False
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    """Pick the Content-Encoding to answer an Accept-Encoding header with.
+
+    Returns one of ``available`` (default: ``available_encodings()``), or
+    None for an uncompressed response.
+    """
+    if available is None:
+        available = available_encodings()
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    # ``available`` is in server preference order, which breaks ties
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+# Compressed bodies of dynamic responses, keyed by (body digest, encoding)
+_compressed_bodies = {}
+_compressed_bodies_lock = threading.Lock()
+_COMPRESSED_BODIES_MAX = 64
+
+
+def encode_response(body, accept_encoding):
+    """Compress a dynamic response body for an Accept-Encoding header.
+
+    Returns ``(body, encoding)``. Compressed bodies are memoized, so a
+    response that does not change (such as a manifest) is compressed once
+    per process rather than once per request.
+    """
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return body, None
+    key = (hashlib.sha1(body).digest(), encoding)
+    with _compressed_bodies_lock:
+        compressed = _compressed_bodies.get(key)
+    if compressed is None:
+        compressed = compress_body(body, encoding, DYNAMIC_BROTLI_QUALITY)
+        with _compressed_bodies_lock:
+            while len(_compressed_bodies) >= _COMPRESSED_BODIES_MAX:
+                _compressed_bodies.pop(next(iter(_compressed_bodies)))
+            _compressed_bodies[key] = compressed
+    return compressed, encoding
+
+
+# Cron schedule of /api/cron/refresh, used when vercel.json is not deployed
+# alongside the functions
+REFRESH_CRON_PATH = "/api/cron/refresh"
+DEFAULT_REFRESH_SCHEDULE = os.getenv("REFRESH_CRON_SCHEDULE", "0 0 * * *")
+
+# Extra time CDNs and clients may serve a catalog past its refresh
+CACHE_STALE_WHILE_REVALIDATE = _env_int("CACHE_STALE_WHILE_REVALIDATE", 3600, minimum=0)
+CACHE_STALE_IF_ERROR = _env_int("CACHE_STALE_IF_ERROR", 86400, minimum=0)
+
+# Cache-Control per endpoint; "catalog" is computed from the refresh
+# schedule unless CATALOG_CACHE_CONTROL is set
+CACHE_CONTROL_POLICIES = {
+    "catalog": os.getenv("CATALOG_CACHE_CONTROL"),
+    "manifest": os.getenv(
+        "MANIFEST_CACHE_CONTROL",
+        "public, max-age=3600, s-maxage=86400, stale-while-revalidate=86400",
+    ),
+    # Stale catalogs are about to be replaced by a background refresh
+    "catalog_stale": os.getenv("CATALOG_STALE_CACHE_CONTROL", "public, max-age=60, s-maxage=60"),
+    # Configuration JSON may contain an API key
+    "configure": os.getenv("CONFIGURE_CACHE_CONTROL", "private, no-cache"),
+}
+
+
+_refresh_schedule = None
+
+
+def get_refresh_schedule():
+    """Cron expression of the refresh job, as declared in vercel.json"""
+    global _refresh_schedule
+    if _refresh_schedule is not None:
+        return _refresh_schedule
+    _refresh_schedule = DEFAULT_REFRESH_SCHEDULE
+    vercel_config = Path(__file__).resolve().parent.parent / "vercel.json"
+    try:
+        with open(vercel_config, 'r') as f:
+            for cron in json.load(f).get("crons", []):
+                if cron.get("path") == REFRESH_CRON_PATH and cron.get("schedule"):
+                    _refresh_schedule = cron["schedule"]
+                    break
+    except Exception:
+        pass
+    return _refresh_schedule
+
+
+# Names accepted in the month and day-of-week cron fields
+CRON_MONTH_NAMES = {
+    name: number for number, name in enumerate(
+        ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"), 1
+    )
+}
+CRON_WEEKDAY_NAMES = {
+    name: number for number, name in enumerate(("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"))
+}
+
+
+def _parse_cron_field(field, low, high, names=None):
+    """Expand one cron field (``*``, lists, ranges, steps, names) into a set"""
+    names = names or {}
+
+    def number(value):
+        return int(names.get(value.upper(), value))
+
+    values = set()
+    for part in field.split(","):
+        spec, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (number(v) for v in spec.split("-", 1))
+        else:
+            start = number(spec)
+            end = high if step > 1 else start
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def next_cron_run(schedule, now=None):
+    """Next time (UTC datetime) a five-field cron schedule fires after ``now``"""
+    now = now or datetime.now(timezone.utc)
+    minute_f, hour_f, dom_f, month_f, dow_f = schedule.split()
+    minutes = sorted(_parse_cron_field(minute_f, 0, 59))
+    hours = sorted(_parse_cron_field(hour_f, 0, 23))
+    days = _parse_cron_field(dom_f, 1, 31)
+    months = _parse_cron_field(month_f, 1, 12, CRON_MONTH_NAMES)
+    weekdays = {day % 7 for day in _parse_cron_field(dow_f, 0, 7, CRON_WEEKDAY_NAMES)}
+    # Like cron, a field starting with "*" (such as "*/2") is unrestricted
+    dom_any, dow_any = dom_f.startswith("*"), dow_f.startswith("*")
+
+    start = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    day = start.replace(hour=0, minute=0)
+    for _ in range(366 * 4):
+        if day.month in months:
+            dom_match = day.day in days
+            dow_match = (day.weekday() + 1) % 7 in weekdays
+            # Like cron: when both are restricted either one may match
+            if dom_any or dow_any:
+                matches = dom_match and dow_match
+            else:
+                matches = dom_match or dow_match
+            if matches:
+                for hour in hours:
+                    for minute in minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+        day += timedelta(days=1)
+    raise ValueError(f"Cron schedule never fires: {schedule}")
+
+
+def seconds_until_next_refresh():
+    """Seconds until the scheduled refresh replaces the current catalogs"""
+    try:
+        next_run = next_cron_run(get_refresh_schedule())
+    except (ValueError, IndexError) as e:
+        print(f"[WARNING] Invalid refresh schedule: {e}")
+        return 86400
+    return int((next_run - datetime.now(timezone.utc)).total_seconds())
+
+
+def get_cache_control(endpoint):
+    """Cache-Control header value for an endpoint of ``CACHE_CONTROL_POLICIES``
+    (anything else, like /refresh and the cron job, is never cached).
+
+    Catalogs stay fresh until the next scheduled refresh (at least a
+    minute), then may be served stale while a CDN revalidates them or
+    while the origin is failing.
+    """
+    policy = CACHE_CONTROL_POLICIES.get(endpoint, "no-store")
+    if policy:
+        return policy
+    max_age = max(60, seconds_until_next_refresh())
+    return (
+        f"public, max-age={max_age}, s-maxage={max_age}, "
+        f"stale-while-revalidate={CACHE_STALE_WHILE_REVALIDATE}, "
+        f"stale-if-error={CACHE_STALE_IF_ERROR}"
+    )
+
+
+def get_data_dir():
+    """Get directory for config and cache files"""
     # Use /tmp for Vercel serverless functions
-    config_dir = Path("/tmp")
+    data_dir = Path(os.getenv("STORAGE_DIR", "/tmp"))
     try:
-        config_dir.mkdir(exist_ok=True)
+        data_dir.mkdir(exist_ok=True)
     except:
         pass
-    return config_dir / "stremio_config.json"
+    return data_dir
+
+
+# Where config, caches and catalog responses are kept: "filesystem" (the
+# instance's own /tmp), "sqlite" (a database file, which may live on a
+# shared volume) or "redis" (shared by every instance)
+STORAGE_BACKENDS = ("filesystem", "sqlite", "redis")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "filesystem")
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "stremio-indian-catalogs:")
+
+
+# Guards file leases within the process where fcntl is unavailable
+_file_lease_lock = threading.Lock()
+
+
+class FileStorage:
+    """Stores each key as a file in the data directory"""
+
+    name = "filesystem"
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory else get_data_dir()
+
+    def path(self, key):
+        return self.directory / key
+
+    def read(self, key):
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, data):
+        # Write a temporary file and rename it over the key, so readers see
+        # either the previous or the new contents, never a partial file
+        path = self.path(key)
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                temp_path.unlink()
+            except FileNotFoundError:
+                pass
+            raise
+
+    def delete(self, key):
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def _lease_guard(self, path):
+        """Serialize lease checks and updates on ``path`` across processes"""
+        if fcntl is None:
+            with _file_lease_lock:
+                yield
+            return
+        with open(path.with_name(f".{path.name}.guard"), "a") as guard:
+            fcntl.flock(guard, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(guard, fcntl.LOCK_UN)
+
+    def acquire_lease(self, key, ttl):
+        """Take an exclusive lease on ``key`` for ``ttl`` seconds.
+
+        The lease is a file holding its token and expiry. Reading the
+        holder, breaking an expired lease and taking it over happen under
+        an ``flock`` on a guard file, so two processes can never both
+        replace the same expired lease. Returns a token for
+        ``release_lease``, or None if it is held.
+        """
+        path = self.path(key)
+        token = os.urandom(8).hex()
+        with self._lease_guard(path):
+            try:
+                _, expires_at = path.read_text().split()
+                if time.time() < float(expires_at):
+                    return None
+            except (FileNotFoundError, ValueError):
+                # No lease, or an unreadable one that is treated as expired
+                pass
+            self.write(key, f"{token} {time.time() + ttl}".encode())
+        return token
+
+    def release_lease(self, key, token):
+        path = self.path(key)
+        with self._lease_guard(path):
+            try:
+                if path.read_text().split()[:1] == [token]:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def version(self, key):
+        try:
+            stat = self.path(key).stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def keys(self, prefix):
+        """Keys starting with ``prefix``, most recently written first"""
+        paths = sorted(
+            self.directory.glob(f"{prefix}*"), key=lambda path: path.stat().st_mtime, reverse=True
+        )
+        return [path.name for path in paths]
+
+
+class SQLiteStorage:
+    """Stores keys as rows of one SQLite table"""
+
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.db_path = str(path or get_data_dir() / "stremio_storage.db")
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS storage ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "version INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _query(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def read(self, key):
+        rows = self._query("SELECT value FROM storage WHERE key = ?", (key,))
+        return bytes(rows[0][0]) if rows else None
+
+    def write(self, key, data):
+        self._query(
+            "INSERT INTO storage (key, value, version, updated_at) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+            "version = storage.version + 1, updated_at = excluded.updated_at",
+            (key, sqlite3.Binary(data), time.time()),
+        )
+
+    def delete(self, key):
+        self._query("DELETE FROM storage WHERE key = ?", (key,))
+
+    def acquire_lease(self, key, ttl):
+        """Take an exclusive lease on ``key`` for ``ttl`` seconds; returns a token or None"""
+        token = os.urandom(8).hex()
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO leases (key, token, expires_at) VALUES (?, ?, ?)",
+                (key, token, now + ttl),
+            )
+        return token if cursor.rowcount == 1 else None
+
+    def release_lease(self, key, token):
+        self._query("DELETE FROM leases WHERE key = ? AND token = ?", (key, token))
+
+    def version(self, key):
+        rows = self._query("SELECT version FROM storage WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def keys(self, prefix):
+        """Keys starting with ``prefix``, most recently written first"""
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self._query(
+            "SELECT key FROM storage WHERE key LIKE ? ESCAPE '\\' ORDER BY updated_at DESC",
+            (escaped + "%",),
+        )
+        return [row[0] for row in rows]
+
+
+class RedisStorage:
+    """Stores keys in Redis (or any server speaking its protocol).
+
+    Every write also bumps a ``<key>#version`` counter, so instances can
+    tell whether their in-memory copy is current with one small ``GET``.
+    """
+
+    name = "redis"
+
+    def __init__(self, url=None, prefix=REDIS_KEY_PREFIX):
+        if redis is None:
+            raise RuntimeError("STORAGE_BACKEND=redis requires the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url or REDIS_URL)
+        self.prefix = prefix
+
+    def read(self, key):
+        return self.client.get(self.prefix + key)
+
+    def write(self, key, data):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.prefix + key, data)
+        pipe.incr(f"{self.prefix}{key}#version")
+        pipe.execute()
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key, f"{self.prefix}{key}#version")
+
+    def acquire_lease(self, key, ttl):
+        """Take an exclusive lease on ``key`` for ``ttl`` seconds; returns a token or None"""
+        token = os.urandom(8).hex()
+        if self.client.set(f"{self.prefix}{key}#lease", token, nx=True, px=int(ttl * 1000)):
+            return token
+        return None
+
+    def release_lease(self, key, token):
+        lease_key = f"{self.prefix}{key}#lease"
+        # The lease expires on its own if it outlives its holder, so the
+        # window between these two commands is harmless
+        if self.client.get(lease_key) == token.encode():
+            self.client.delete(lease_key)
+
+    def version(self, key):
+        version = self.client.get(f"{self.prefix}{key}#version")
+        return int(version) if version is not None else None
+
+    def keys(self, prefix):
+        """Keys starting with ``prefix``"""
+        keys = []
+        for key in self.client.scan_iter(match=f"{self.prefix}{prefix}*"):
+            key = key.decode()[len(self.prefix):]
+            if not key.endswith(("#version", "#lease")):
+                keys.append(key)
+        return keys
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Storage backend selected by ``STORAGE_BACKEND``, created once per process"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = STORAGE_BACKEND if STORAGE_BACKEND in STORAGE_BACKENDS else "filesystem"
+                if backend == "sqlite":
+                    _storage = SQLiteStorage(STORAGE_SQLITE_PATH)
+                elif backend == "redis":
+                    _storage = RedisStorage()
+                else:
+                    _storage = FileStorage()
+    return _storage
+
+
+def read_json(key, default=None):
+    """Load a JSON document from storage, or ``default`` if missing or unreadable"""
+    try:
+        data = get_storage().read(key)
+        if data is not None:
+            return json_loads(data)
+    except Exception as e:
+        print(f"[WARNING] Could not read {key}: {e}")
+    return default
+
+
+def write_json(key, value):
+    """Store a JSON document; returns False (after logging) if it failed"""
+    try:
+        get_storage().write(key, json_dumps(value))
+        return True
+    except Exception as e:
+        print(f"[WARNING] Could not write {key}: {e}")
+        return False
+
+
+def delete_key(key):
+    """Remove a key from storage, ignoring failures"""
+    try:
+        get_storage().delete(key)
+    except Exception as e:
+        print(f"[WARNING] Could not remove {key}: {e}")
+
+
+def get_config_key():
+    """Get storage key of the config file"""
+    return "stremio_config.json"
 
 def encode_config_token(config):
     """Encode a configuration dict into a compact token."""
@@ -87,19 +1020,14 @@ def load_config(token=None):
     if token:
         return decode_config_token(token)
 
-    # Try to load from file first
-    config_path = get_config_path()
-    if config_path.exists():
-        try:
-            with open(config_path, 'r') as f:
-                file_config = json.load(f)
-                # Merge with environment variables (env takes precedence for API key)
-                return {
-                    "tmdb_api_key": os.getenv('TMDB_API_KEY', file_config.get("tmdb_api_key", '')),
-                    "enabled_languages": file_config.get("enabled_languages", ["malayalam"])
-                }
-        except:
-            pass
+    # Try to load from storage first
+    file_config = read_json(get_config_key())
+    if isinstance(file_config, dict):
+        # Merge with environment variables (env takes precedence for API key)
+        return {
+            "tmdb_api_key": os.getenv('TMDB_API_KEY', file_config.get("tmdb_api_key", '')),
+            "enabled_languages": file_config.get("enabled_languages", ["malayalam"])
+        }
     
     # Default config from environment variables
     enabled_langs = os.getenv('ENABLED_LANGUAGES', 'malayalam')
@@ -115,13 +1043,8 @@ def load_config(token=None):
 
 def save_config(config):
     """Save user configuration"""
-    config_path = get_config_path()
-    try:
-        with open(config_path, 'w') as f:
-            json.dump(config, f)
-    except Exception as e:
-        print(f"[WARNING] Could not save config to file: {e}")
-        # Config will still work via environment variables
+    # On failure config will still work via environment variables
+    write_json(get_config_key(), config)
 
 def get_tmdb_key(token=None):
     """Get TMDB API key from config or env"""
@@ -134,116 +1057,1495 @@ def get_enabled_languages(token=None):
     config = load_config(token)
     return config.get("enabled_languages", ["malayalam"])
 
-def fetch_movies_for_language(language_code, tmdb_key):
-    """Fetch movies for a specific language"""
-    print(f"[CACHE] Fetching {LANGUAGE_NAMES.get(language_code, language_code)} OTT movies...")
-    
-    today = datetime.now().strftime("%Y-%m-%d")
-    final_movies = []
-    
-    lang_code = LANGUAGE_CODES.get(language_code, language_code)
-    
-    for page in range(1, 1000):
-        print(f"[INFO] Checking page {page} for {language_code}")
-        params = {
-            "api_key": tmdb_key,
-            "with_original_language": lang_code,
-            "sort_by": "release_date.desc",
-            "release_date.lte": today,
-            "region": "IN",
-            "page": page
-        }
-        
-        try:
-            response = requests.get(f"{TMDB_BASE_URL}/discover/movie", params=params, timeout=30)
-            if response.status_code != 200:
-                print(f"[ERROR] TMDB API error: {response.status_code}")
-                break
-                
-            results = response.json().get("results", [])
-            if not results:
-                break
-            
-            for movie in results:
-                movie_id = movie.get("id")
-                title = movie.get("title")
-                if not movie_id or not title:
-                    continue
-                
-                # Check OTT availability
-                try:
-                    providers_url = f"{TMDB_BASE_URL}/movie/{movie_id}/watch/providers"
-                    prov_response = requests.get(providers_url, params={"api_key": tmdb_key}, timeout=30)
-                    prov_data = prov_response.json()
-                    
-                    if "results" in prov_data and "IN" in prov_data["results"]:
-                        if "flatrate" in prov_data["results"]["IN"]:
-                            # Now get IMDb ID
-                            ext_url = f"{TMDB_BASE_URL}/movie/{movie_id}/external_ids"
-                            ext_response = requests.get(ext_url, params={"api_key": tmdb_key}, timeout=30)
-                            ext_data = ext_response.json()
-                            imdb_id = ext_data.get("imdb_id")
-                            
-                            if imdb_id and imdb_id.startswith("tt"):
-                                movie["imdb_id"] = imdb_id
-                                movie["language"] = language_code
-                                final_movies.append(movie)
-                except Exception as e:
-                    print(f"[ERROR] Error checking OTT for movie {movie_id}: {e}")
-                    continue
-                    
-        except Exception as e:
-            print(f"[ERROR] Page {page} failed: {e}")
-            break
-    
+def merge_movies(*movie_lists):
+    """Merge movie lists into one deduplicated, release-date ordered list.
+
+    Earlier lists win when the same IMDb ID appears more than once.
+    """
+    movies = [movie for movies in movie_lists for movie in movies]
+    # Stable sort, so earlier lists stay first among equal release dates
+    movies.sort(key=lambda m: m.get("release_date") or "", reverse=True)
+
     # Deduplicate
     seen_ids = set()
     unique_movies = []
-    for movie in final_movies:
+    for movie in movies:
         imdb_id = movie.get("imdb_id")
         if imdb_id and imdb_id not in seen_ids:
             seen_ids.add(imdb_id)
             unique_movies.append(movie)
-    
-    print(f"[CACHE] Fetched {len(unique_movies)} {LANGUAGE_NAMES.get(language_code, language_code)} OTT movies ✅")
     return unique_movies
 
-def get_cache_path(language, token=None):
-    """Get path to cache file for a language"""
-    # Use /tmp for Vercel serverless functions
-    cache_dir = Path("/tmp")
-    try:
-        cache_dir.mkdir(exist_ok=True)
-    except:
-        pass
-    if token:
-        token_hash = hashlib.sha1(token.encode()).hexdigest()[:10]
-    else:
-        token_hash = "default"
-    return cache_dir / f"movies_cache_{language}_{token_hash}.json"
 
+def build_discover_params(language_code, discover=None, watch_providers=None):
+    """Build the /discover/movie query (without page) for a language"""
+    discover = discover or TMDB_DISCOVER_MODE
+    if watch_providers is None:
+        watch_providers = TMDB_WATCH_PROVIDERS
 
-def save_cache(language, movies, token=None):
-    """Save movies cache for a language"""
-    cache_path = get_cache_path(language, token)
-    try:
-        with open(cache_path, 'w') as f:
-            json.dump(movies, f)
-    except Exception as e:
-        print(f"[WARNING] Could not save cache for {language}: {e}")
+    params = {
+        "with_original_language": LANGUAGE_CODES.get(language_code, language_code),
+        "sort_by": "release_date.desc",
+        "release_date.lte": datetime.now().strftime("%Y-%m-%d"),
+        "region": WATCH_REGION,
+    }
+    if discover == "ott":
+        params["watch_region"] = WATCH_REGION
+        params["with_watch_monetization_types"] = "flatrate"
+        if watch_providers:
+            params["with_watch_providers"] = watch_providers
+    return params
 
 
-def load_cache(language, token=None):
-    """Load movies cache for a language"""
-    cache_path = get_cache_path(language, token)
-    if cache_path.exists():
+def fetch_movies_for_language(language_code, tmdb_key, concurrency=None, enrichment=None,
+                              discover=None, verify_providers=None, watch_providers=None,
+                              stats=None, since=None, start_page=1, deadline=None):
+    """Fetch movies for a specific language (blocking wrapper around the async engine)"""
+    return asyncio.run(fetch_movies_for_language_async(
+        language_code, tmdb_key, concurrency, enrichment,
+        discover, verify_providers, watch_providers, stats, since,
+        start_page, deadline,
+    ))
+
+
+async def fetch_movies_for_language_async(language_code, tmdb_key, concurrency=None, enrichment=None,
+                                          discover=None, verify_providers=None, watch_providers=None,
+                                          stats=None, since=None, start_page=1, deadline=None):
+    """Fetch movies for a specific language with concurrent TMDB requests.
+
+    Collects ``iter_movies_for_language_async`` (see there for the
+    arguments) into one deduplicated, release-date ordered list.
+    """
+    print(f"[CACHE] Fetching {LANGUAGE_NAMES.get(language_code, language_code)} OTT movies...")
+
+    movies = [
+        movie async for movie in iter_movies_for_language_async(
+            language_code, tmdb_key, concurrency, enrichment,
+            discover, verify_providers, watch_providers, stats, since,
+            start_page, deadline,
+        )
+    ]
+    unique_movies = merge_movies(movies)
+
+    print(f"[CACHE] Fetched {len(unique_movies)} {LANGUAGE_NAMES.get(language_code, language_code)} OTT movies ✅")
+    return unique_movies
+
+
+def iter_movies_for_language(language_code, tmdb_key, *args, **kwargs):
+    """Yield confirmed movies for a language as the crawl finds them.
+
+    Blocking counterpart of ``iter_movies_for_language_async``, driving its
+    own event loop one movie at a time. Stopping the iteration early cancels
+    outstanding requests and still saves the enrichment caches.
+    """
+    loop = asyncio.new_event_loop()
+    movies = iter_movies_for_language_async(language_code, tmdb_key, *args, **kwargs)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(movies.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(movies.aclose())
+        loop.close()
+
+
+async def iter_movies_for_language_async(language_code, tmdb_key, concurrency=None, enrichment=None,
+                                         discover=None, verify_providers=None, watch_providers=None,
+                                         stats=None, since=None, start_page=1, deadline=None,
+                                         on_progress=None):
+    """Yield the OTT movies of a language, in page order, as they are confirmed.
+
+    ``concurrency`` caps the requests in flight, ``enrichment`` is one of
+    ``ENRICHMENT_MODES`` and ``discover`` one of ``DISCOVER_MODES``;
+    ``verify_providers`` re-checks providers after "ott" discover. ``since``
+    (YYYY-MM-DD) stops at older releases, ``start_page`` resumes a crawl and
+    ``deadline`` (a ``time.time()`` value) stops scheduling page windows.
+    ``on_progress(next_page)`` is called once the pages before ``next_page``
+    are yielded, and ``stats`` receives the crawl counters, including
+    ``failed_pages`` and ``next_page`` (None once complete).
+    """
+    concurrency = concurrency or TMDB_CONCURRENCY
+    enrichment = enrichment or TMDB_ENRICHMENT_MODE
+    discover = discover or TMDB_DISCOVER_MODE
+    if verify_providers is None:
+        verify_providers = TMDB_VERIFY_PROVIDERS
+    # Without server-side filtering the providers check is what decides membership
+    check_providers = verify_providers or discover != "ott"
+    discover_params = build_discover_params(language_code, discover, watch_providers)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def tmdb_get(path, params):
+        async with semaphore:
+            return await loop.run_in_executor(
+                executor, partial(tmdb_request, path, params, tmdb_key)
+            )
+
+    store = get_movie_store()
+    enrichment_cache = load_enrichment_cache()
+    negative_cache = load_negative_cache()
+    # Entries this crawl changed, merged into the stored caches at the end
+    enrichment_updates = {}
+    negative_updates = {}
+    negative_removed = set()
+    counters = {
+        "pages_fetched": 0,
+        "failed_pages": [],
+        "movie_requests": 0,
+        "movie_errors": 0,
+        "enrichment_cache_hits": 0,
+        "negative_cache_skips": 0,
+        "negative_cache_calls_avoided": 0,
+    }
+
+    def reject(movie, reason):
+        movie_id = str(movie.get("id"))
+        negative_cache[movie_id] = negative_updates[movie_id] = {
+            "reason": reason,
+            "release_date": movie.get("release_date"),
+            "checked_at": time.time(),
+        }
+        negative_removed.discard(movie_id)
+
+    def calls_needed(reason):
+        """Per-movie requests a re-check of a rejected title would cost"""
+        if not check_providers or enrichment == "append":
+            return 1
+        return 2 if reason == "no_imdb_id" else 1
+
+    async def movie_get(path, params):
+        """Per-movie payload; an unknown movie (404) has no providers or IDs"""
+        counters["movie_requests"] += 1
+        response = await tmdb_get(path, params)
+        if response.status_code == 404:
+            return {}
+        if response.status_code != 200:
+            # Throttled or failing even after retries: this says nothing
+            # about the movie, so it must not be cached or rejected
+            raise RuntimeError(f"TMDB returned {response.status_code} for {path}")
+        return json_loads(response.content)
+
+    def stored_enrichment(movies):
+        """Movie store enrichment rows of a page's movies, keyed by TMDB movie ID"""
+        if store is None:
+            return {}
         try:
-            with open(cache_path, 'r') as f:
-                return json.load(f)
-        except:
-            pass
+            return store.load_enrichment(movie["id"] for movie in movies)
+        except Exception as e:
+            print(f"[WARNING] Could not read enrichment from movie store: {e}")
+            return {}
+
+    async def check_movie(movie, stored):
+        movie_id = movie.get("id")
+        rejected = negative_cache.get(str(movie_id))
+        # With "ott" discover TMDB is authoritative about flatrate offers
+        if rejected and not check_providers and rejected.get("reason") == "no_flatrate":
+            rejected = None
+        if rejected and negative_cache_valid(rejected):
+            counters["negative_cache_skips"] += 1
+            counters["negative_cache_calls_avoided"] += calls_needed(rejected.get("reason"))
+            return None
+
+        entry = dict(
+            enrichment_updates.get(str(movie_id)) or stored or enrichment_cache.get(str(movie_id)) or {}
+        )
+        imdb_id = entry.get("imdb_id")
+        cached = bool(imdb_id) and (not check_providers or providers_fresh(entry))
+        imdb_checked = bool(imdb_id)
+        try:
+            if check_providers and providers_fresh(entry):
+                flatrate = entry["has_flatrate"]
+            elif check_providers:
+                if enrichment == "append" and not imdb_id:
+                    # Providers and IMDb ID in a single round trip
+                    data = await movie_get(
+                        f"/movie/{movie_id}",
+                        {"append_to_response": "watch/providers,external_ids"},
+                    )
+                    prov_data = data.get("watch/providers")
+                    imdb_id = (data.get("external_ids") or {}).get("imdb_id")
+                    imdb_checked = True
+                else:
+                    prov_data = await movie_get(f"/movie/{movie_id}/watch/providers", {})
+                flatrate = has_flatrate(prov_data, WATCH_REGION)
+                entry["has_flatrate"] = flatrate
+                entry["providers_checked_at"] = time.time()
+            else:
+                # Discover already guaranteed an IN flatrate offer
+                flatrate = True
+
+            # Check OTT availability
+            if flatrate and not imdb_checked:
+                ext_data = await movie_get(f"/movie/{movie_id}/external_ids", {})
+                imdb_id = ext_data.get("imdb_id")
+
+            if imdb_id and imdb_id.startswith("tt"):
+                entry["imdb_id"] = imdb_id
+            entry["used_at"] = time.time()
+            enrichment_cache[str(movie_id)] = enrichment_updates[str(movie_id)] = entry
+
+            if cached:
+                counters["enrichment_cache_hits"] += 1
+            if not flatrate:
+                reject(movie, "no_flatrate")
+            elif not (imdb_id and imdb_id.startswith("tt")):
+                reject(movie, "no_imdb_id")
+            else:
+                if negative_cache.pop(str(movie_id), None) is not None:
+                    negative_updates.pop(str(movie_id), None)
+                    negative_removed.add(str(movie_id))
+                movie["imdb_id"] = imdb_id
+                movie["language"] = language_code
+                return movie
+        except Exception as e:
+            counters["movie_errors"] += 1
+            print(f"[ERROR] Error checking OTT for movie {movie_id}: {e}")
+        return None
+
+    async def fetch_page(page):
+        """Return the discover payload for a page, or None if it failed"""
+        print(f"[INFO] Checking page {page} for {language_code}")
+        try:
+            response = await tmdb_get("/discover/movie", {**discover_params, "page": page})
+            if response.status_code != 200:
+                print(f"[ERROR] TMDB API error on page {page}: {response.status_code}")
+                counters["failed_pages"].append(page)
+                return None
+            payload = json_loads(response.content)
+            counters["pages_fetched"] += 1
+            return payload
+        except Exception as e:
+            print(f"[ERROR] Page {page} failed: {e}")
+            counters["failed_pages"].append(page)
+            return None
+
+    async def check_page(payload):
+        """Filter and enrich one discover page, keeping its order"""
+        if payload is None:
+            return None
+        candidates = [
+            m for m in payload.get("results", [])
+            if m.get("id") and m.get("title")
+            and (since is None or (m.get("release_date") or "") >= since)
+        ]
+        stored = stored_enrichment(candidates)
+        return await asyncio.gather(*(check_movie(m, stored.get(str(m["id"]))) for m in candidates))
+
+    def passed_since(payload):
+        """Check whether a page reaches releases older than ``since``"""
+        results = payload.get("results") or []
+        return not results or (results[-1].get("release_date") or "") < since
+
+    async def process_page(page):
+        payload = await fetch_page(page)
+        if payload is None:
+            return None
+        return await check_page(payload)
+
+    def report_progress(next_page):
+        if on_progress is None:
+            return
+        if stats is not None:
+            stats.update(counters)
+        on_progress(next_page)
+
+    seen_ids = set()
+
+    def dedupe(page_movies):
+        """Drop rejected movies and IMDb IDs already yielded"""
+        for movie in page_movies or ():
+            if movie and movie["imdb_id"] not in seen_ids:
+                seen_ids.add(movie["imdb_id"])
+                yield movie
+
+    pages_planned = 0
+    next_page = None
+    tasks = deque()
+    try:
+        first_page = await fetch_page(start_page)
+        if first_page is not None:
+            # TMDB refuses pages past TMDB_MAX_PAGES even if total_pages is higher
+            pages_planned = min(int(first_page.get("total_pages") or 1), TMDB_MAX_PAGES)
+            if since is None and deadline is None and start_page == 1:
+                later_pages = iter(range(2, pages_planned + 1))
+                tasks.extend(
+                    asyncio.ensure_future(process_page(page))
+                    for page in islice(later_pages, TMDB_PAGE_WINDOW)
+                )
+                # Page 1 enrichment runs alongside the fan-out of the other pages
+                for movie in dedupe(await check_page(first_page)):
+                    yield movie
+                page = start_page
+                while tasks:
+                    report_progress(page + 1)
+                    page_movies = await tasks.popleft()
+                    page += 1
+                    # Keep the window full while this page is consumed
+                    tasks.extend(asyncio.ensure_future(process_page(p)) for p in islice(later_pages, 1))
+                    for movie in dedupe(page_movies):
+                        yield movie
+            else:
+                window_started = time.time()
+                first_movies = await check_page(first_page)
+                # Time per page of the last window, to predict the next one
+                page_seconds = time.time() - window_started
+                next_page = start_page + 1
+                done = since is not None and passed_since(first_page)
+                for movie in dedupe(first_movies):
+                    yield movie
+                while not done and next_page <= pages_planned:
+                    report_progress(next_page)
+                    window = range(next_page, min(next_page + TMDB_PAGE_WINDOW, pages_planned + 1))
+                    if deadline is not None and time.time() + page_seconds * len(window) > deadline:
+                        print(f"[INFO] {language_code}: time budget reached, stopping before page {next_page}")
+                        break
+                    window_started = time.time()
+                    payloads = await asyncio.gather(*(fetch_page(page) for page in window))
+                    window_movies = await asyncio.gather(*(check_page(p) for p in payloads))
+                    page_seconds = (time.time() - window_started) / len(window)
+                    done = since is not None and any(p is not None and passed_since(p) for p in payloads)
+                    next_page = window[-1] + 1
+                    for page_movies in window_movies:
+                        for movie in dedupe(page_movies):
+                            yield movie
+                if done or next_page > pages_planned:
+                    next_page = None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        save_enrichment_cache(enrichment_updates)
+        save_negative_cache(negative_updates, negative_removed)
+
+        if stats is not None:
+            stats["pages_planned"] = pages_planned
+            stats["next_page"] = next_page
+            stats.update(counters)
+        print(f"[INFO] {language_code}: fetched {counters['pages_fetched']}/{pages_planned} planned discover pages, "
+              f"{counters['movie_requests']} movie requests, "
+              f"{counters['enrichment_cache_hits']} served from enrichment cache, "
+              f"{counters['negative_cache_calls_avoided']} avoided by negative cache")
+        http_stats = get_http_stats()
+        print(f"[INFO] HTTP pool: {http_stats['connections_opened']} connections opened, "
+              f"{http_stats['connections_reused']} reused")
+
+
+def get_enrichment_cache_key():
+    """Get storage key of the per-movie enrichment cache"""
+    return "tmdb_enrichment_cache.json"
+
+
+def load_enrichment_cache():
+    """Load per-movie enrichment data keyed by TMDB movie ID.
+
+    Entries hold ``imdb_id`` (it never changes), ``has_flatrate`` with
+    ``providers_checked_at`` (valid for ``PROVIDERS_CACHE_TTL`` seconds)
+    and ``used_at``; see ``enrichment_entry_valid``. The cache is shared by
+    every language, token and refresh.
+    """
+    return read_json(get_enrichment_cache_key(), {})
+
+
+def enrichment_entry_valid(entry):
+    """Check whether an enrichment entry is worth keeping.
+
+    Entries unused for ``ENRICHMENT_CACHE_MAX_AGE`` are dropped, as are
+    entries whose only content is expired provider data.
+    """
+    used_at = entry.get("used_at") or entry.get("providers_checked_at")
+    if used_at is not None and time.time() - used_at >= ENRICHMENT_CACHE_MAX_AGE:
+        return False
+    return bool(entry.get("imdb_id")) or providers_fresh(entry)
+
+
+def save_enrichment_cache(updates):
+    """Merge one crawl's enrichment entries into the stored cache and the movie store"""
+    update_shared_cache(get_enrichment_cache_key(), updates, keep=enrichment_entry_valid)
+    store = get_movie_store()
+    if store is not None and updates:
+        try:
+            store.save_enrichment(updates)
+        except Exception as e:
+            print(f"[WARNING] Could not save enrichment to movie store: {e}")
+
+
+def providers_fresh(entry):
+    """Check whether cached provider data for a movie is still within its TTL"""
+    checked_at = entry.get("providers_checked_at")
+    return (
+        "has_flatrate" in entry
+        and checked_at is not None
+        and time.time() - checked_at < PROVIDERS_CACHE_TTL
+    )
+
+
+def get_negative_cache_key():
+    """Get storage key of the cache of rejected TMDB movie IDs"""
+    return "tmdb_negative_cache.json"
+
+
+def load_negative_cache():
+    """Load rejected movies keyed by TMDB movie ID.
+
+    Entries hold the ``reason`` ("no_flatrate" or "no_imdb_id"), the
+    ``release_date`` and ``checked_at``; see ``negative_cache_valid``.
+    """
+    return read_json(get_negative_cache_key(), {})
+
+
+def save_negative_cache(updates, removed=()):
+    """Merge one crawl's rejections (and titles no longer rejected) into the stored cache"""
+    update_shared_cache(get_negative_cache_key(), updates, removed, keep=negative_cache_valid)
+
+
+def update_shared_cache(key, updates, removed=(), keep=None):
+    """Merge changes into a JSON cache that concurrent crawls also update.
+
+    The latest stored copy is re-read under a lease, so entries written by
+    background refreshes and cold fetches running meanwhile survive, and
+    entries failing ``keep`` are dropped. If the lease stays taken for
+    ``SHARED_CACHE_LOCK_TIMEOUT`` seconds the changes are merged anyway.
+    Returns the merged cache, or None if the stored copy could not be read.
+    """
+    storage = get_storage()
+    lease_key = f"{key}.lease"
+    token = None
+    deadline = time.time() + SHARED_CACHE_LOCK_TIMEOUT
+    try:
+        while True:
+            token = storage.acquire_lease(lease_key, SHARED_CACHE_LOCK_TIMEOUT)
+            if token is not None or time.time() >= deadline:
+                break
+            time.sleep(COLD_FETCH_POLL_INTERVAL)
+    except Exception as e:
+        print(f"[WARNING] Could not lock {key}: {e}")
+    if token is None:
+        print(f"[WARNING] Updating {key} without its lease")
+    try:
+        try:
+            data = storage.read(key)
+            cache = json_loads(data) if data is not None else {}
+        except Exception as e:
+            # Rewriting it from this crawl's changes alone would lose the rest
+            print(f"[WARNING] Could not read {key}, leaving it unchanged: {e}")
+            return None
+        cache.update(updates)
+        for entry_key in removed:
+            cache.pop(entry_key, None)
+        if keep is not None:
+            cache = {entry_key: entry for entry_key, entry in cache.items() if keep(entry)}
+        write_json(key, cache)
+        return cache
+    finally:
+        if token is not None:
+            storage.release_lease(lease_key, token)
+
+
+def negative_recheck_interval(release_date):
+    """Seconds before a rejected title is checked again.
+
+    Recent releases often gain streaming offers or IMDb IDs soon after
+    release, old catalogue titles rarely do.
+    """
+    try:
+        age_days = (datetime.now() - datetime.strptime(release_date, "%Y-%m-%d")).days
+    except (TypeError, ValueError):
+        age_days = None
+    for max_age, recheck_days in NEGATIVE_CACHE_TIERS:
+        if max_age is None or (age_days is not None and age_days <= max_age):
+            return recheck_days * 86400
+    return NEGATIVE_CACHE_TIERS[-1][1] * 86400
+
+
+def negative_cache_valid(entry):
+    """Check whether a rejection is recent enough to skip the title"""
+    checked_at = entry.get("checked_at") or 0
+    return time.time() - checked_at < negative_recheck_interval(entry.get("release_date"))
+
+
+# Bounds of the in-process cache of stored catalog responses, by entries
+# and by megabytes; 0 entries disables it
+CATALOG_MEMORY_CACHE_ENTRIES = _env_int("CATALOG_MEMORY_CACHE_ENTRIES", 32, minimum=0)
+CATALOG_MEMORY_CACHE_MB = _env_int("CATALOG_MEMORY_CACHE_MB", 64)
+
+
+class StorageLRUCache:
+    """Thread-safe LRU of values loaded from storage, bounded by entries and bytes.
+
+    Entries remember the backend's version of their key (file modification
+    time and size, or a write counter), so a value rewritten by a refresh
+    is reloaded on its next read instead of being served stale. A hit costs
+    one version lookup (a ``stat`` on the filesystem) and no reads.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self, key, parse=None):
+        """Return the (parsed) value stored at ``key``, or None if it does not exist.
+
+        ``parse`` turns the raw bytes into the cached value; without it the
+        bytes themselves are cached.
+        """
+        storage = get_storage()
+        version = storage.version(key)
+        if version is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        data = storage.read(key)
+        if data is None:
+            return None
+        value = parse(data) if parse else data
+        size = len(data)
+        if not self.max_entries or size > self.max_bytes:
+            return value
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (version, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+catalog_memory_cache = StorageLRUCache(CATALOG_MEMORY_CACHE_ENTRIES, CATALOG_MEMORY_CACHE_MB * 1024 * 1024)
+
+
+def get_dataset_params(language):
+    """Crawl parameters that determine the movie list of a language"""
+    discover = TMDB_DISCOVER_MODE
+    return {
+        "language": LANGUAGE_CODES.get(language, language),
+        "region": WATCH_REGION,
+        "discover": discover,
+        "watch_providers": TMDB_WATCH_PROVIDERS if discover == "ott" else "",
+        "verify_providers": TMDB_VERIFY_PROVIDERS or discover != "ott",
+    }
+
+
+def get_dataset_id(language):
+    """Identify the shared catalog dataset of a language.
+
+    The movie list depends only on the language and the crawl parameters,
+    not on who asks for it, so every token enabling a language maps onto
+    the same dataset and one refresh serves all of them.
+    """
+    params = json.dumps(get_dataset_params(language), sort_keys=True, separators=(",", ":"))
+    return f"{language}_{hashlib.sha1(params.encode()).hexdigest()[:10]}"
+
+
+# Indexed SQLite store of the served movie fields, queried for catalog pages
+MOVIE_STORE_ENABLED = _env_bool("MOVIE_STORE_ENABLED", True)
+MOVIE_STORE_PATH = os.getenv("MOVIE_STORE_PATH")
+
+# Number of metas per catalog page. Catalogs declare Stremio's ``skip``
+# extra and are served page by page; 0 serves whole catalogs instead
+CATALOG_PAGE_SIZE = _env_int("CATALOG_PAGE_SIZE", 100, minimum=0)
+
+# Movie fields kept in caches and the store: what ``to_stremio_meta`` serves
+# plus the ``id``, ``imdb_id`` and ``release_date`` used to merge and index
+MOVIE_RECORD_FIELDS = ("id", "imdb_id", "title", "release_date", "poster_path", "backdrop_path", "overview")
+
+# On-disk schema of movie caches. Version 1 was a JSON list of full TMDB
+# movie objects; version 2 is {"schema": 2, "fields": [...], "rows": [...]}
+# with one array of ``MOVIE_RECORD_FIELDS`` values per movie
+MOVIE_CACHE_SCHEMA = 2
+
+
+class MovieRecord:
+    """Compact movie holding only ``MOVIE_RECORD_FIELDS``.
+
+    Supports the ``movie.get(field)`` and ``movie[field]`` access used on
+    the TMDB movie dicts it is projected from, so both can be merged and
+    converted alike. A None value counts as missing.
+    """
+
+    __slots__ = MOVIE_RECORD_FIELDS
+
+    def __init__(self, **values):
+        for field in MOVIE_RECORD_FIELDS:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def from_movie(cls, movie):
+        """Project a TMDB movie dict (or another record) onto a record"""
+        if isinstance(movie, cls):
+            return movie
+        return cls(**{field: movie.get(field) for field in MOVIE_RECORD_FIELDS})
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        value = getattr(self, field, None)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __repr__(self):
+        return f"MovieRecord(id={self.id!r}, imdb_id={self.imdb_id!r}, title={self.title!r})"
+
+
+def encode_movie_rows(movies):
+    """Project movies onto rows of ``MOVIE_RECORD_FIELDS`` values"""
+    return [
+        [getattr(record, field) for field in MOVIE_RECORD_FIELDS]
+        for record in map(MovieRecord.from_movie, movies)
+    ]
+
+
+def decode_movie_rows(rows, fields=MOVIE_RECORD_FIELDS):
+    """Turn rows of ``fields`` values back into records"""
+    return [MovieRecord(**dict(zip(fields, row))) for row in rows]
+
+
+def encode_movie_cache(movies):
+    """Serialize movies in the current ``MOVIE_CACHE_SCHEMA``"""
+    return json_dumps(
+        {"schema": MOVIE_CACHE_SCHEMA, "fields": MOVIE_RECORD_FIELDS, "rows": encode_movie_rows(movies)}
+    )
+
+
+def decode_movie_cache(data):
+    """Parse a movie cache of any schema version into records.
+
+    Returns ``(records, current)``; ``current`` is False for caches that
+    should be rewritten in the current schema.
+    """
+    cache = json_loads(data)
+    if isinstance(cache, list):
+        # Schema 1: full TMDB movie objects
+        return [MovieRecord.from_movie(movie) for movie in cache], False
+    fields = cache.get("fields", MOVIE_RECORD_FIELDS)
+    records = decode_movie_rows(cache.get("rows", []), fields)
+    return records, cache.get("schema") == MOVIE_CACHE_SCHEMA and list(fields) == list(MOVIE_RECORD_FIELDS)
+
+
+class MovieStore:
+    """Normalized, indexed SQLite store of catalog movies.
+
+    ``movies`` holds one row per TMDB movie, ``enrichment`` the per-movie
+    IMDb ID and provider check, and ``language_movies`` which movies each
+    dataset serves, in catalog order (``position`` follows ``merge_movies``,
+    newest release first). The database runs in WAL mode, so catalog
+    requests keep reading while a refresh rewrites a dataset.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS movies ("
+        "id INTEGER PRIMARY KEY, imdb_id TEXT, title TEXT, release_date TEXT, "
+        "poster_path TEXT, backdrop_path TEXT, overview TEXT)",
+        "CREATE INDEX IF NOT EXISTS movies_release_date ON movies (release_date)",
+        "CREATE INDEX IF NOT EXISTS movies_imdb_id ON movies (imdb_id)",
+        "CREATE TABLE IF NOT EXISTS enrichment ("
+        "movie_id INTEGER PRIMARY KEY, imdb_id TEXT, has_flatrate INTEGER, "
+        "providers_checked_at REAL, used_at REAL)",
+        "CREATE TABLE IF NOT EXISTS language_movies ("
+        "dataset TEXT NOT NULL, language TEXT NOT NULL, movie_id INTEGER NOT NULL, "
+        "position INTEGER NOT NULL, PRIMARY KEY (dataset, movie_id))",
+        "CREATE INDEX IF NOT EXISTS language_movies_language ON language_movies (language)",
+        "CREATE INDEX IF NOT EXISTS language_movies_order ON language_movies (dataset, position)",
+    )
+
+    def __init__(self, path=None):
+        self.db_path = str(path or get_data_dir() / "stremio_movies.db")
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                for statement in self.SCHEMA:
+                    self._conn.execute(statement)
+
+    def replace_dataset(self, language, movies):
+        """Replace the movies served for ``language``; returns how many are served"""
+        dataset = get_dataset_id(language)
+        served = [movie for movie in movies if to_stremio_meta(movie)]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO movies ({', '.join(MOVIE_RECORD_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in MOVIE_RECORD_FIELDS)})",
+                [tuple(movie.get(field) for field in MOVIE_RECORD_FIELDS) for movie in served],
+            )
+            self._conn.execute("DELETE FROM language_movies WHERE dataset = ?", (dataset,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO language_movies (dataset, language, movie_id, position) "
+                "VALUES (?, ?, ?, ?)",
+                [(dataset, language, movie["id"], position) for position, movie in enumerate(served)],
+            )
+            self._conn.execute(
+                "DELETE FROM movies WHERE id NOT IN (SELECT movie_id FROM language_movies)"
+            )
+        return len(served)
+
+    def load_enrichment(self, movie_ids):
+        """Enrichment entries (see ``load_enrichment_cache``) of TMDB movie IDs, keyed by ID"""
+        movie_ids = [int(movie_id) for movie_id in movie_ids]
+        if not movie_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT movie_id, imdb_id, has_flatrate, providers_checked_at, used_at FROM enrichment "
+                f"WHERE movie_id IN ({', '.join('?' for _ in movie_ids)})",
+                movie_ids,
+            ).fetchall()
+        entries = {}
+        for row in rows:
+            entry = {field: row[field] for field in row.keys()[1:] if row[field] is not None}
+            if "has_flatrate" in entry:
+                entry["has_flatrate"] = bool(entry["has_flatrate"])
+            entries[str(row["movie_id"])] = entry
+        return entries
+
+    def save_enrichment(self, updates):
+        """Store one crawl's enrichment entries and drop those no longer worth keeping"""
+        rows = []
+        for movie_id, entry in updates.items():
+            has_flatrate = entry.get("has_flatrate")
+            rows.append((
+                int(movie_id),
+                entry.get("imdb_id"),
+                None if has_flatrate is None else int(has_flatrate),
+                entry.get("providers_checked_at"),
+                entry.get("used_at"),
+            ))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO enrichment (movie_id, imdb_id, has_flatrate, providers_checked_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "DELETE FROM enrichment WHERE COALESCE(used_at, providers_checked_at) < ?",
+                (time.time() - ENRICHMENT_CACHE_MAX_AGE,),
+            )
+
+    def count(self, language):
+        """Number of movies served for ``language``"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM language_movies WHERE dataset = ?", (get_dataset_id(language),)
+            ).fetchone()
+        return row[0]
+
+    def fetch_page(self, language, skip=0, limit=None):
+        """Movies ``[skip, skip + limit)`` of a language in catalog order"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join('m.' + field for field in MOVIE_RECORD_FIELDS)} "
+                "FROM language_movies lm JOIN movies m ON m.id = lm.movie_id "
+                "WHERE lm.dataset = ? ORDER BY lm.position LIMIT ? OFFSET ?",
+                (get_dataset_id(language), -1 if limit is None else limit, skip),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+_movie_store = None
+_movie_store_lock = threading.Lock()
+
+
+def get_movie_store():
+    """The movie store, created once per process, or None if disabled or unavailable"""
+    global _movie_store
+    if not MOVIE_STORE_ENABLED:
+        return None
+    if _movie_store is None:
+        with _movie_store_lock:
+            if _movie_store is None:
+                try:
+                    _movie_store = MovieStore(MOVIE_STORE_PATH)
+                except Exception as e:
+                    print(f"[WARNING] Could not open movie store: {e}")
+                    return None
+    return _movie_store
+
+
+def load_catalog_page(language, skip=0, limit=None):
+    """Stremio metas ``[skip, skip + limit)`` of a language, queried from the movie store.
+
+    Returns None when the store is disabled or holds no movies for the
+    language yet, so callers can fall back to the cached movie list.
+    """
+    store = get_movie_store()
+    if store is None:
+        return None
+    try:
+        if not store.count(language):
+            return None
+        return [meta for meta in map(to_stremio_meta, store.fetch_page(language, skip, limit)) if meta]
+    except Exception as e:
+        print(f"[WARNING] Could not query movie store for {language}: {e}")
+        return None
+
+
+# Binary catalog index: a header (magic, meta count), an offset table of
+# count + 1 little-endian u64 offsets and the compact JSON metas joined by
+# commas. Meta i spans [offsets[i], offsets[i + 1] - 1) of the data, so
+# any run of consecutive metas is one contiguous byte range.
+CATALOG_INDEX_MAGIC = b"STRMCAT1"
+CATALOG_INDEX_HEADER = struct.Struct("<8sI")
+CATALOG_INDEX_OFFSET = struct.Struct("<Q")
+
+
+def encode_catalog_index(metas):
+    """Build a binary catalog index from Stremio metas"""
+    fragments = [json_dumps(meta) for meta in metas]
+    offsets = []
+    position = 0
+    for fragment in fragments:
+        offsets.append(position)
+        position += len(fragment) + 1
+    offsets.append(position)
+    return b"".join((
+        CATALOG_INDEX_HEADER.pack(CATALOG_INDEX_MAGIC, len(fragments)),
+        struct.pack(f"<{len(offsets)}Q", *offsets),
+        b",".join(fragments),
+    ))
+
+
+class CatalogIndex:
+    """Binary catalog index (see ``encode_catalog_index``) over bytes or a memory map"""
+
+    def __init__(self, data):
+        self._map = data
+        magic, self.count = CATALOG_INDEX_HEADER.unpack_from(self._map, 0)
+        if magic != CATALOG_INDEX_MAGIC:
+            raise ValueError("Not a catalog index")
+        self._offsets_start = CATALOG_INDEX_HEADER.size
+        self._data_start = self._offsets_start + CATALOG_INDEX_OFFSET.size * (self.count + 1)
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map the catalog index file at ``path``"""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _offset(self, index):
+        return CATALOG_INDEX_OFFSET.unpack_from(self._map, self._offsets_start + CATALOG_INDEX_OFFSET.size * index)[0]
+
+    def page(self, skip=0, limit=None):
+        """``{"metas": [...]}`` response bytes for metas ``[skip, skip + limit)``"""
+        end = self.count if limit is None else min(self.count, skip + limit)
+        if skip >= end:
+            return b'{"metas":[]}'
+        start_byte = self._data_start + self._offset(skip)
+        end_byte = self._data_start + self._offset(end) - 1
+        return b'{"metas":[' + self._map[start_byte:end_byte] + b']}'
+
+
+_catalog_indexes = {}
+_catalog_indexes_lock = threading.Lock()
+
+
+def open_catalog_index(language):
+    """Map the binary catalog index of a language, or None if there is none.
+
+    Mappings are kept per process and reopened when a refresh writes a new
+    version. Backends without local files are first copied to a file in
+    the data directory.
+    """
+    storage = get_storage()
+    key = get_catalog_index_key(language)
+    version = storage.version(key)
+    if version is None:
+        return None
+    with _catalog_indexes_lock:
+        cached = _catalog_indexes.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if isinstance(storage, FileStorage):
+            path = storage.path(key)
+        else:
+            data = storage.read(key)
+            if data is None:
+                return None
+            path = get_data_dir() / f"local_{key}"
+            FileStorage(path.parent).write(path.name, data)
+        # A file replaced by a later refresh stays mapped until dropped
+        index = CatalogIndex.open(path)
+        _catalog_indexes[key] = (version, index)
+        return index
+
+
+def load_catalog_slice(language, skip=0, limit=None):
+    """Catalog response bytes for metas ``[skip, skip + limit)`` of a language.
+
+    Sliced straight out of the memory-mapped binary catalog index, with no
+    JSON work per request. Returns None if the index has not been written.
+    """
+    try:
+        index = open_catalog_index(language)
+        return index.page(skip, limit) if index is not None else None
+    except Exception as e:
+        print(f"[WARNING] Could not read catalog index for {language}: {e}")
+        return None
+
+
+def get_cache_key(language):
+    """Get storage key of the movies cache of a language"""
+    return f"movies_{get_dataset_id(language)}.json"
+
+
+def get_catalog_response_key(language, encoding=None):
+    """Get storage key of the pre-serialized Stremio catalog response of a language"""
+    key = f"catalog_{get_dataset_id(language)}.json"
+    if encoding:
+        key += ENCODING_SUFFIXES[encoding]
+    return key
+
+
+def get_catalog_index_key(language):
+    """Get storage key of the binary catalog index of a language"""
+    return f"catalog_{get_dataset_id(language)}.bin"
+
+
+def get_catalog_page_key(language, skip, encoding=None):
+    """Get storage key of a pre-compressed catalog page starting at ``skip``"""
+    key = f"catalog_{get_dataset_id(language)}.page{skip}.json"
+    if encoding:
+        key += ENCODING_SUFFIXES[encoding]
+    return key
+
+
+def delete_catalog_pages(language, keep=()):
+    """Delete the pre-compressed catalog pages of a language, except ``keep``"""
+    for key in get_storage().keys(f"catalog_{get_dataset_id(language)}.page"):
+        if key not in keep:
+            delete_key(key)
+
+
+def get_catalog_meta_key(language):
+    """Get storage key of the version metadata of a catalog response"""
+    return f"catalog_{get_dataset_id(language)}.meta.json"
+
+
+def load_catalog_meta(language):
+    """Load version metadata of the catalog response of a language.
+
+    Holds the content ``digest`` (for ETags), ``last_modified`` (when the
+    content last changed), ``refreshed_at`` (when it was last written),
+    ``expires_at`` (when it turns stale), the pre-compressed ``encodings``
+    and the ``metas`` count. This small
+    file is all a conditional request needs to read.
+    """
+    try:
+        return catalog_memory_cache.load(get_catalog_meta_key(language), json_loads)
+    except Exception:
+        return None
+
+
+def save_cache(language, movies):
+    """Save movies cache for a language, with the catalog artifacts served from it.
+
+    ``movies`` may be any iterable, such as ``iter_movies_for_language``;
+    it is written once exhausted. Returns the number of movies written.
+    """
+    storage = get_storage()
+    response_key = get_catalog_response_key(language)
+    saved_movies = []
+    catalog_metas = []
+    try:
+        for movie in movies:
+            record = MovieRecord.from_movie(movie)
+            saved_movies.append(record)
+            meta = to_stremio_meta(record)
+            if meta:
+                catalog_metas.append(meta)
+        storage.write(get_cache_key(language), encode_movie_cache(saved_movies))
+    except Exception as e:
+        print(f"[WARNING] Could not save cache for {language}: {e}")
+    count = len(saved_movies)
+    metas = len(catalog_metas)
+
+    store = get_movie_store()
+    if store is not None:
+        try:
+            store.replace_dataset(language, saved_movies)
+        except Exception as e:
+            print(f"[WARNING] Could not save {language} to movie store: {e}")
+
+    if not metas:
+        # Nothing to serve; let the catalog endpoint fall back to fetching
+        for key in (
+            *(get_catalog_response_key(language, encoding) for encoding in (None, *ENCODING_SUFFIXES)),
+            get_catalog_meta_key(language),
+            get_catalog_index_key(language),
+        ):
+            delete_key(key)
+        delete_catalog_pages(language)
+        return count
+
+    try:
+        index = encode_catalog_index(catalog_metas)
+        storage.write(get_catalog_index_key(language), index)
+        digest = hashlib.sha1(index).hexdigest()[:20]
+        encodings = page_encodings = []
+        written_pages = set()
+        if CATALOG_PAGE_SIZE:
+            # Paged catalogs are served from the index, each page also
+            # pre-compressed
+            for encoding in (None, *ENCODING_SUFFIXES):
+                delete_key(get_catalog_response_key(language, encoding))
+            pages = CatalogIndex(index)
+            for skip in range(0, pages.count, CATALOG_PAGE_SIZE):
+                page_key = get_catalog_page_key(language, skip)
+                page_encodings = write_compressed_variants(page_key, pages.page(skip, CATALOG_PAGE_SIZE))
+                written_pages.update(page_key + ENCODING_SUFFIXES[encoding] for encoding in page_encodings)
+        else:
+            body = json_dumps({"metas": catalog_metas})
+            storage.write(response_key, body)
+            encodings = write_compressed_variants(response_key, body)
+        delete_catalog_pages(language, keep=written_pages)
+        now = time.time()
+        previous = load_catalog_meta(language) or {}
+        write_json(get_catalog_meta_key(language), {
+            "digest": digest,
+            # An unchanged catalog keeps its Last-Modified across refreshes
+            "last_modified": previous.get("last_modified", now) if previous.get("digest") == digest else now,
+            "refreshed_at": now,
+            "expires_at": now + CATALOG_TTLS.get(language, CATALOG_TTL),
+            "encodings": encodings,
+            "page_size": CATALOG_PAGE_SIZE,
+            "page_encodings": page_encodings,
+            "metas": metas,
+        })
+    except Exception as e:
+        print(f"[WARNING] Could not save catalog variants for {language}: {e}")
+    return count
+
+
+def load_compressed_catalog_page(language, catalog_meta, skip, limit, encoding):
+    """Load the page written pre-compressed by the last refresh for a request.
+
+    Returns None when the refresh wrote no such page: a ``skip`` off the
+    page boundaries, another page size or encoding, or past the end.
+    """
+    if (
+        not limit or skip % limit or skip >= catalog_meta.get("metas", 0)
+        or limit != catalog_meta.get("page_size")
+        or encoding not in catalog_meta.get("page_encodings", [])
+    ):
+        return None
+    try:
+        return catalog_memory_cache.load(get_catalog_page_key(language, skip, encoding))
+    except Exception as e:
+        print(f"[WARNING] Could not load catalog page for {language}: {e}")
+        return None
+
+
+def load_catalog_response(language, encoding=None):
+    """Load the pre-serialized catalog response of a language.
+
+    ``encoding`` selects a pre-compressed variant. Bodies are kept in the
+    in-process LRU, so repeat requests served by a warm instance skip the
+    disk. Returns bytes, or None if that response has not been written
+    (for example before the first refresh).
+    """
+    try:
+        return catalog_memory_cache.load(get_catalog_response_key(language, encoding))
+    except Exception as e:
+        print(f"[WARNING] Could not load catalog response for {language}: {e}")
+        return None
+
+
+def load_cache(language):
+    """Load movies cache for a language as ``MovieRecord`` objects.
+
+    Caches in an older schema, including per-token caches written before
+    datasets were shared, are migrated to the current one on first read.
+    """
+    storage = get_storage()
+    cache_key = get_cache_key(language)
+    try:
+        data = storage.read(cache_key)
+        legacy = data is None
+        if legacy:
+            # Caches written before datasets were shared were kept per token
+            legacy_keys = storage.keys(f"movies_cache_{language}_")
+            data = storage.read(legacy_keys[0]) if legacy_keys else None
+            if data is None:
+                return []
+        movies, current = decode_movie_cache(data)
+        if legacy or not current:
+            storage.write(cache_key, encode_movie_cache(movies))
+            print(f"[CACHE] Migrated {len(movies)} cached {language} movies to schema {MOVIE_CACHE_SCHEMA}")
+        return movies
+    except Exception as e:
+        print(f"[WARNING] Could not load cache for {language}: {e}")
     return []
 
+
+def fetch_catalog_once(language, tmdb_key, budget=None):
+    """Fetch a missing catalog once for every request asking for it.
+
+    The first request takes a lease on the dataset and crawls TMDB for at
+    most ``budget`` seconds; its metas are published under a storage key
+    that concurrent requests (in this or other instances) wait for instead
+    of starting crawls of their own. Only a complete crawl is saved to the
+    cache. Returns ``(metas, complete)``.
+    """
+    budget = CATALOG_FETCH_BUDGET_SECONDS if budget is None else budget
+    storage = get_storage()
+    dataset = get_dataset_id(language)
+    lease_key = f"cold_fetch_{dataset}.lease"
+    result_key = f"cold_fetch_{dataset}.json"
+    lease_ttl = budget + COLD_FETCH_LEASE_MARGIN
+    started = time.time()
+
+    def fresh_result():
+        result = read_json(result_key)
+        if result and result.get("fetched_at", 0) >= started:
+            return result["metas"], result["complete"]
+        return None
+
+    while True:
+        token = storage.acquire_lease(lease_key, lease_ttl)
+        # A result may have been published just before its lease was released
+        result = fresh_result()
+        if result is not None:
+            if token is not None:
+                storage.release_lease(lease_key, token)
+            print(f"[INFO] Served {language} from a concurrent fetch")
+            return result
+        if token is not None:
+            break
+        if time.time() - started >= lease_ttl:
+            print(f"[WARNING] Gave up waiting for a concurrent fetch of {language}")
+            return [], False
+        time.sleep(COLD_FETCH_POLL_INTERVAL)
+
+    try:
+        fetch_stats = {}
+        movies = merge_movies(
+            iter_movies_for_language(language, tmdb_key, stats=fetch_stats, deadline=time.time() + budget)
+        )
+        complete = fetch_stats.get("next_page") is None and not (
+            fetch_stats.get("failed_pages") or fetch_stats.get("movie_errors")
+        )
+        if movies and complete:
+            save_cache(language, movies)
+            print(f"[INFO] Saved {len(movies)} movies to cache for {language}")
+        elif movies:
+            print(f"[INFO] Time budget reached, serving {len(movies)} movies for {language} without caching")
+        else:
+            print(f"[WARNING] Fetch returned no movies for {language}")
+        metas = [meta for meta in map(to_stremio_meta, movies) if meta]
+        complete = complete and bool(metas)
+        write_json(result_key, {"metas": metas, "complete": complete, "fetched_at": time.time()})
+        return metas, complete
+    finally:
+        storage.release_lease(lease_key, token)
+
+
+def get_sync_state_key(language):
+    """Get storage key of the incremental sync state of a language"""
+    return f"sync_state_{get_dataset_id(language)}.json"
+
+
+def load_sync_state(language):
+    """Load sync state of a language.
+
+    Holds ``newest_release_date`` (the frontier of the last sync) and the
+    ``last_sync`` and ``last_full_sync`` timestamps.
+    """
+    return read_json(get_sync_state_key(language), {})
+
+
+def save_sync_state(language, state):
+    """Save sync state of a language"""
+    write_json(get_sync_state_key(language), state)
+
+
+def refresh_language(language, tmdb_key, mode="auto", stats=None, deadline=None, checkpoint=None,
+                     on_checkpoint=None):
+    """Refresh the cached catalog of a language and return its movies.
+
+    ``mode`` is one of ``REFRESH_MODES``; "incremental" merges the titles
+    back to ``INCREMENTAL_OVERLAP_DAYS`` before the previous frontier into
+    the cache. A crawl stopped by ``deadline`` saves nothing but leaves
+    ``stats["checkpoint"]``, which resumes it when passed as ``checkpoint``;
+    ``on_checkpoint`` receives one every ``REFRESH_PROGRESS_INTERVAL``.
+    """
+    state = load_sync_state(language)
+    existing = load_cache(language)
+    stats = {} if stats is None else stats
+
+    if checkpoint:
+        mode = checkpoint["mode"]
+        since = checkpoint.get("since")
+        start_page = checkpoint["next_page"]
+        partial = decode_movie_rows(checkpoint.get("rows", []), checkpoint.get("fields", MOVIE_RECORD_FIELDS))
+        incomplete = checkpoint.get("incomplete", False)
+        print(f"[REFRESH] Resuming {mode} refresh of {language} at page {start_page}")
+    else:
+        if mode not in REFRESH_MODES:
+            mode = "auto"
+        if mode == "auto":
+            full_due = time.time() - state.get("last_full_sync", 0) >= FULL_REFRESH_INTERVAL
+            if full_due or not existing or not state.get("newest_release_date"):
+                mode = "full"
+            else:
+                mode = "incremental"
+        if mode == "incremental" and not state.get("newest_release_date"):
+            mode = "full"
+
+        since = None
+        if mode == "incremental":
+            frontier = datetime.strptime(state["newest_release_date"], "%Y-%m-%d")
+            since = (frontier - timedelta(days=INCREMENTAL_OVERLAP_DAYS)).strftime("%Y-%m-%d")
+            print(f"[REFRESH] Incremental refresh of {language} since {since}")
+        else:
+            print(f"[REFRESH] Full refresh of {language}")
+        start_page = 1
+        partial = []
+        incomplete = False
+
+    def make_checkpoint(next_page, movies):
+        return {
+            "language": language,
+            "mode": mode,
+            "since": since,
+            "next_page": next_page,
+            "fields": MOVIE_RECORD_FIELDS,
+            "rows": encode_movie_rows(movies),
+            "incomplete": incomplete or bool(stats.get("failed_pages") or stats.get("movie_errors")),
+        }
+
+    found = []
+    progress_saved = time.time()
+
+    def save_progress(next_page):
+        nonlocal progress_saved
+        if on_checkpoint is None or time.time() - progress_saved < REFRESH_PROGRESS_INTERVAL:
+            return
+        on_checkpoint(make_checkpoint(next_page, merge_movies(partial, found)))
+        progress_saved = time.time()
+
+    print(f"[CACHE] Fetching {LANGUAGE_NAMES.get(language, language)} OTT movies...")
+    found.extend(iter_movies_for_language(
+        language, tmdb_key, stats=stats, since=since,
+        start_page=start_page, deadline=deadline, on_progress=save_progress,
+    ))
+    fresh = merge_movies(partial, found)
+    print(f"[CACHE] Fetched {len(fresh)} {LANGUAGE_NAMES.get(language, language)} OTT movies ✅")
+    stats["mode"] = mode
+    stats["checkpoint"] = make_checkpoint(stats.get("next_page"), fresh)
+    incomplete = stats["incomplete"] = stats["checkpoint"]["incomplete"]
+
+    if stats.get("next_page"):
+        print(f"[REFRESH] {language} stopped at page {stats['next_page']} with {len(fresh)} movies so far")
+        return fresh
+    del stats["checkpoint"]
+
+    if not fresh and not stats.get("pages_fetched") and existing:
+        # TMDB was unreachable; keep serving what we have
+        print(f"[WARNING] No discover pages fetched for {language}, keeping existing cache")
+        return existing
+
+    if incomplete:
+        # Cached titles on the failed pages would be dropped otherwise
+        print(f"[WARNING] {language}: {len(stats.get('failed_pages') or [])} discover pages and "
+              f"{stats.get('movie_errors') or 0} movies failed, keeping every cached title")
+        kept = existing
+    elif mode == "incremental":
+        kept = [m for m in existing if (m.get("release_date") or "") < since]
+    else:
+        kept = []
+
+    if mode == "incremental" or kept:
+        movies = merge_movies(fresh, kept)
+        known_ids = {m.get("id") for m in existing}
+        new_titles = sum(1 for m in fresh if m.get("id") not in known_ids)
+        print(f"[REFRESH] {new_titles} new {language} titles merged into {len(kept)} cached")
+    else:
+        movies = fresh
+
+    save_cache(language, movies)
+
+    now = time.time()
+    newest = max((m.get("release_date") or "" for m in movies), default="")
+    state.update({
+        "newest_release_date": newest or state.get("newest_release_date"),
+        "last_sync": now,
+    })
+    if mode == "full" and not incomplete:
+        state["last_full_sync"] = now
+    save_sync_state(language, state)
+    return movies
+
+
+def get_refresh_checkpoint_key(languages):
+    """Get storage key of the checkpoint of an unfinished refresh of some languages"""
+    datasets = ",".join(sorted(get_dataset_id(lang) for lang in languages))
+    return f"refresh_checkpoint_{hashlib.sha1(datasets.encode()).hexdigest()[:10]}.json"
+
+
+def load_refresh_checkpoint(languages):
+    """Load the checkpoint of an unfinished refresh, if it is still recent"""
+    checkpoint = read_json(get_refresh_checkpoint_key(languages))
+    if checkpoint and time.time() - checkpoint.get("saved_at", 0) < REFRESH_CHECKPOINT_MAX_AGE:
+        return checkpoint
+    return None
+
+
+def save_refresh_checkpoint(languages, checkpoint):
+    """Save the checkpoint of an unfinished refresh"""
+    write_json(get_refresh_checkpoint_key(languages), {**checkpoint, "saved_at": time.time()})
+
+
+def clear_refresh_checkpoint(languages):
+    """Remove the checkpoint once a refresh has completed"""
+    delete_key(get_refresh_checkpoint_key(languages))
+
+
+def refresh_languages(languages, tmdb_key, mode="auto", budget=None):
+    """Refresh several languages within an optional wall-clock budget.
+
+    ``budget`` is in seconds. When it runs out the cursor and partial
+    results are checkpointed, and the next call picks up from there, so a
+    full crawl can complete across several short invocations. Returns a
+    dict with ``status`` ("complete" or "partial"), the ``completed``
+    languages with their movie counts and the ``pending`` languages.
+    """
+    deadline = None
+    if budget:
+        deadline = time.time() + max(1, budget - REFRESH_DEADLINE_MARGIN)
+
+    pending = list(languages)
+    completed = {}
+    checkpoint = load_refresh_checkpoint(languages)
+    if checkpoint:
+        completed = {
+            lang: count for lang, count in checkpoint.get("completed", {}).items()
+            if lang in languages
+        }
+        resumed = [lang for lang in checkpoint.get("pending", []) if lang in languages]
+        pending = resumed + [
+            lang for lang in languages if lang not in resumed and lang not in completed
+        ]
+
+    for index, lang in enumerate(pending):
+        if deadline is not None and time.time() >= deadline:
+            save_refresh_checkpoint(languages, {"pending": pending[index:], "completed": completed})
+            return {"status": "partial", "completed": completed, "pending": pending[index:]}
+
+        lang_checkpoint = None
+        if checkpoint and checkpoint.get("language") == lang:
+            lang_checkpoint = checkpoint
+        stats = {}
+
+        def save_progress(lang_checkpoint, pending=pending[index:]):
+            save_refresh_checkpoint(languages, {"pending": pending, "completed": completed, **lang_checkpoint})
+
+        movies = refresh_language(lang, tmdb_key, mode, stats, deadline, lang_checkpoint, save_progress)
+        if stats.get("checkpoint"):
+            save_progress(stats["checkpoint"])
+            return {"status": "partial", "completed": completed, "pending": pending[index:]}
+        completed[lang] = len(movies)
+        if index + 1 < len(pending):
+            # Do not let progress saved for this language outlive it
+            save_refresh_checkpoint(languages, {"pending": pending[index + 1:], "completed": completed})
+
+    clear_refresh_checkpoint(languages)
+    return {"status": "complete", "completed": completed, "pending": []}
+
+
+def catalog_is_stale(catalog_meta, language=None):
+    """Check whether a catalog (see ``load_catalog_meta``) of a language is past its TTL"""
+    expires_at = catalog_meta.get("expires_at")
+    if expires_at is None:
+        expires_at = catalog_meta.get("refreshed_at", 0) + CATALOG_TTLS.get(language, CATALOG_TTL)
+    return time.time() >= expires_at
+
+
+_background_refreshes = set()
+_background_refreshes_lock = threading.Lock()
+
+
+def refresh_in_background(language, tmdb_key):
+    """Refresh a language in a background thread unless a refresh is running.
+
+    Requests keep being served the cached catalog meanwhile. Refreshes are
+    deduplicated within the process and, through a lease in the storage
+    backend, across instances. A refresh that fails or runs out of budget
+    keeps its lease until it expires, which spaces out the retries (an
+    unfinished crawl resumes from its checkpoint). Returns True if a
+    refresh was started.
+    """
+    if not tmdb_key:
+        return False
+    dataset = get_dataset_id(language)
+    with _background_refreshes_lock:
+        if dataset in _background_refreshes:
+            return False
+        _background_refreshes.add(dataset)
+
+    storage = get_storage()
+    lease_key = f"refresh_{dataset}.lease"
+    try:
+        token = storage.acquire_lease(lease_key, (REFRESH_BUDGET_SECONDS or 300) + COLD_FETCH_LEASE_MARGIN)
+    except Exception as e:
+        print(f"[WARNING] Could not take refresh lease for {language}: {e}")
+        token = None
+    if token is None:
+        with _background_refreshes_lock:
+            _background_refreshes.discard(dataset)
+        return False
+
+    def run():
+        try:
+            result = refresh_languages([language], tmdb_key, budget=REFRESH_BUDGET_SECONDS)
+            if result["status"] == "complete":
+                storage.release_lease(lease_key, token)
+            print(f"[REFRESH] Background refresh of {language}: {result['status']}")
+        except Exception as e:
+            print(f"[ERROR] Background refresh of {language} failed: {e}")
+        finally:
+            with _background_refreshes_lock:
+                _background_refreshes.discard(dataset)
+
+    threading.Thread(target=run, name=f"refresh-{dataset}", daemon=True).start()
+    return True
+
+
 def to_stremio_meta(movie):
     """Convert movie to Stremio format"""
     try:
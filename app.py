@@ -9,7 +9,10 @@ CORS(app)
 
 # Read TMDB API key from an environment variable
 TMDB_API_KEY = os.getenv('TMDB_API_KEY', 'YOUR TMDB API KEY')
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
+TMDB_BASE_URL = os.getenv('TMDB_BASE_URL', "https://api.themoviedb.org/3")
+
+# Keep-alive session reused for every TMDB request
+tmdb_session = requests.Session()
 
 # Global movie cache
 all_movies_cache = []
@@ -33,7 +36,7 @@ def fetch_and_cache_movies():
         }
 
         try:
-            response = requests.get(f"{TMDB_BASE_URL}/discover/movie", params=params)
+            response = tmdb_session.get(f"{TMDB_BASE_URL}/discover/movie", params=params, timeout=30)
             results = response.json().get("results", [])
             if not results:
                 break
@@ -44,18 +47,19 @@ def fetch_and_cache_movies():
                 if not movie_id or not title:
                     continue
 
-                # Check OTT availability
-                providers_url = f"{TMDB_BASE_URL}/movie/{movie_id}/watch/providers"
-                prov_response = requests.get(providers_url, params={"api_key": TMDB_API_KEY})
-                prov_data = prov_response.json()
+                # Providers and IMDb ID in a single round trip
+                details_url = f"{TMDB_BASE_URL}/movie/{movie_id}"
+                details_response = tmdb_session.get(details_url, params={
+                    "api_key": TMDB_API_KEY,
+                    "append_to_response": "watch/providers,external_ids"
+                }, timeout=30)
+                details = details_response.json()
+                prov_data = details.get("watch/providers") or {}
 
+                # Check OTT availability
                 if "results" in prov_data and "IN" in prov_data["results"]:
                     if "flatrate" in prov_data["results"]["IN"]:
-                        # Now get IMDb ID
-                        ext_url = f"{TMDB_BASE_URL}/movie/{movie_id}/external_ids"
-                        ext_response = requests.get(ext_url, params={"api_key": TMDB_API_KEY})
-                        ext_data = ext_response.json()
-                        imdb_id = ext_data.get("imdb_id")
+                        imdb_id = (details.get("external_ids") or {}).get("imdb_id")
 
                         if imdb_id and imdb_id.startswith("tt"):
                             movie["imdb_id"] = imdb_id
@@ -0,0 +1,85 @@
+"""Compare the installed JSON codecs on synthetic catalogs.
+
+Times the three JSON operations behind a catalog: encoding the
+``{"metas": [...]}`` response, and encoding and decoding the movie cache.
+
+    python benchmarks/json_codec.py [sizes...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils import (  # noqa: E402
+    JSON_CODECS,
+    MOVIE_CACHE_SCHEMA,
+    MOVIE_RECORD_FIELDS,
+    MovieRecord,
+    to_stremio_meta,
+)
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+REPEATS = 5
+
+
+def make_movies(count):
+    """TMDB-like discover results for ``count`` movies"""
+    rng = random.Random(count)
+    movies = []
+    for movie_id in range(1, count + 1):
+        movies.append({
+            "id": movie_id,
+            "imdb_id": f"tt{movie_id:07d}",
+            "title": f"Movie {movie_id} മലയാളം",
+            "original_title": f"Original title {movie_id}",
+            "release_date": f"20{rng.randint(10, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "poster_path": f"/poster{movie_id}.jpg",
+            "backdrop_path": f"/backdrop{movie_id}.jpg",
+            "overview": " ".join(rng.choice(("a", "movie", "about", "family", "love", "city")) for _ in range(40)),
+            "genre_ids": [rng.randint(10, 99) for _ in range(3)],
+            "popularity": rng.random() * 100,
+            "vote_average": round(rng.random() * 10, 1),
+            "vote_count": rng.randint(0, 5000),
+            "original_language": "ml",
+            "adult": False,
+            "video": False,
+        })
+    return movies
+
+
+def best_of(func):
+    """Fastest of ``REPEATS`` runs, in milliseconds"""
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main(sizes):
+    print(f"{'movies':>8} {'codec':>8} {'catalog encode':>15} {'cache encode':>13} {'cache decode':>13} {'catalog bytes':>14}")
+    for size in sizes:
+        records = [MovieRecord.from_movie(movie) for movie in make_movies(size)]
+        catalog = {"metas": [to_stremio_meta(record) for record in records]}
+        cache = {
+            "schema": MOVIE_CACHE_SCHEMA,
+            "fields": MOVIE_RECORD_FIELDS,
+            "rows": [[getattr(record, field) for field in MOVIE_RECORD_FIELDS] for record in records],
+        }
+        for name, (dumps, loads) in JSON_CODECS.items():
+            body = dumps(catalog)
+            encoded_cache = dumps(cache)
+            print(
+                f"{size:>8} {name:>8} "
+                f"{best_of(lambda: dumps(catalog)):>12.1f} ms "
+                f"{best_of(lambda: dumps(cache)):>10.1f} ms "
+                f"{best_of(lambda: loads(encoded_cache)):>10.1f} ms "
+                f"{len(body):>14}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,197 @@
+"""Catalog artifact, catalog and manifest endpoint tests on a private storage directory.
+
+    python -m unittest discover tests
+"""
+import email.message
+import gzip
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import catalog, manifest, utils  # noqa: E402
+
+
+def make_movies(count):
+    return [
+        {"id": movie_id, "imdb_id": f"tt{movie_id:07d}", "title": f"Movie {movie_id}",
+         "release_date": f"2024-01-{1 + movie_id % 28:02d}", "poster_path": f"/{movie_id}.jpg"}
+        for movie_id in range(1, count + 1)
+    ]
+
+
+def get(handler_class, path, **headers):
+    """Run a handler on a GET request; returns (status, headers, body)"""
+    request = handler_class.__new__(handler_class)
+    request.path, request.command, request.request_version = path, "GET", "HTTP/1.1"
+    request.requestline = f"GET {path} HTTP/1.1"
+    request.headers = email.message.Message()
+    for name, value in headers.items():
+        request.headers[name.replace("_", "-")] = value
+    request.rfile, request.wfile = io.BytesIO(), io.BytesIO()
+    request.client_address, request.server = ("127.0.0.1", 0), None
+    request.log_message = lambda *args: None
+    request.do_GET()
+
+    head, _, body = request.wfile.getvalue().partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    response_headers = dict(line.split(": ", 1) for line in header_lines)
+    return int(status_line.split()[1]), response_headers, body
+
+
+class CatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patcher in (
+            mock.patch.object(utils, "_storage", utils.FileStorage(directory.name)),
+            mock.patch.object(utils, "MOVIE_STORE_ENABLED", False),
+            mock.patch.object(utils, "catalog_memory_cache", utils.StorageLRUCache(8, 8 * 1024 * 1024)),
+            mock.patch.dict(os.environ, {"STORAGE_DIR": directory.name}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+class CatalogTTLTest(CatalogTestCase):
+    def test_language_ttl_overrides_the_default(self):
+        with mock.patch.dict(utils.CATALOG_TTLS, {"hindi": 6 * 3600}):
+            utils.save_cache("hindi", make_movies(3))
+            utils.save_cache("malayalam", make_movies(3))
+
+        hindi = utils.load_catalog_meta("hindi")
+        malayalam = utils.load_catalog_meta("malayalam")
+        self.assertAlmostEqual(hindi["expires_at"] - hindi["refreshed_at"], 6 * 3600)
+        self.assertAlmostEqual(malayalam["expires_at"] - malayalam["refreshed_at"], utils.CATALOG_TTL)
+
+    def test_catalogs_without_expiry_use_the_language_ttl(self):
+        refreshed = {"refreshed_at": time.time() - 7 * 3600}
+        with mock.patch.dict(utils.CATALOG_TTLS, {"hindi": 6 * 3600}):
+            self.assertTrue(utils.catalog_is_stale(refreshed, "hindi"))
+            self.assertFalse(utils.catalog_is_stale(refreshed, "malayalam"))
+
+
+class MovieCacheMigrationTest(CatalogTestCase):
+    def raw_movies(self):
+        return [{**movie, "genre_ids": [18], "popularity": 1.5, "adult": False} for movie in make_movies(3)]
+
+    def assertMigrated(self):
+        movies = utils.load_cache("malayalam")
+        self.assertEqual([movie["imdb_id"] for movie in movies], ["tt0000001", "tt0000002", "tt0000003"])
+        self.assertIsInstance(movies[0], utils.MovieRecord)
+        stored = utils.json_loads(utils._storage.read(utils.get_cache_key("malayalam")))
+        self.assertEqual(stored["schema"], utils.MOVIE_CACHE_SCHEMA)
+        self.assertEqual(stored["fields"], list(utils.MOVIE_RECORD_FIELDS))
+
+    def test_schema_1_cache_is_rewritten(self):
+        utils.write_json(utils.get_cache_key("malayalam"), self.raw_movies())
+        self.assertMigrated()
+
+    def test_per_token_cache_moves_to_the_dataset(self):
+        utils.write_json("movies_cache_malayalam_sometoken.json", self.raw_movies())
+        self.assertMigrated()
+
+    def test_missing_cache_is_empty(self):
+        self.assertEqual(utils.load_cache("malayalam"), [])
+        self.assertIsNone(utils._storage.read(utils.get_cache_key("malayalam")))
+
+
+class CatalogPageTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        for module in (utils, catalog):
+            patcher = mock.patch.object(module, "CATALOG_PAGE_SIZE", 10)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        utils.save_cache("malayalam", make_movies(25))
+
+    def test_pages_are_compressed_for_the_client(self):
+        status, plain_headers, plain = get(catalog.handler, "/catalog/movie/malayalam/skip=10.json")
+        self.assertEqual(status, 200)
+        self.assertNotIn("Content-Encoding", plain_headers)
+        self.assertEqual(plain, utils.load_catalog_slice("malayalam", 10, 10))
+        self.assertEqual(len(utils.json_loads(plain)["metas"]), 10)
+
+        with mock.patch.object(utils, "compress_body", wraps=utils.compress_body) as compress_body:
+            status, headers, body = get(
+                catalog.handler, "/catalog/movie/malayalam/skip=10.json", Accept_Encoding="gzip"
+            )
+        # Written at refresh time, not compressed per request
+        compress_body.assert_not_called()
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(body), plain)
+        self.assertNotEqual(headers["ETag"], plain_headers["ETag"])
+
+        status, headers, _ = get(
+            catalog.handler, "/catalog/movie/malayalam/skip=10.json", Accept_Encoding="gzip", If_None_Match=headers["ETag"]
+        )
+        self.assertEqual(status, 304)
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        status, _, _ = get(catalog.handler, "/catalog/movie/malayalam/skip=10.json", If_None_Match=headers["ETag"])
+        self.assertEqual(status, 200)
+
+    def test_unaligned_pages_are_compressed_on_request(self):
+        with mock.patch.object(utils, "compress_body", wraps=utils.compress_body) as compress_body:
+            status, headers, body = get(
+                catalog.handler, "/catalog/movie/malayalam/skip=5.json", Accept_Encoding="gzip"
+            )
+            get(catalog.handler, "/catalog/movie/malayalam/skip=5.json", Accept_Encoding="gzip")
+
+        compress_body.assert_called_once_with(mock.ANY, "gzip", utils.DYNAMIC_BROTLI_QUALITY)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body), utils.load_catalog_slice("malayalam", 5, 10))
+
+    def test_only_pages_are_written_pre_compressed(self):
+        meta = utils.load_catalog_meta("malayalam")
+        encodings = utils.available_encodings()
+        self.assertEqual(meta["encodings"], [])
+        self.assertEqual(meta["page_encodings"], encodings)
+        self.assertEqual(sorted(utils._storage.keys("catalog_")), sorted([
+            utils.get_catalog_index_key("malayalam"),
+            utils.get_catalog_meta_key("malayalam"),
+            *(utils.get_catalog_page_key("malayalam", skip, encoding)
+              for skip in (0, 10, 20) for encoding in encodings),
+        ]))
+
+    def test_pages_past_a_shrunk_catalog_are_deleted(self):
+        utils.save_cache("malayalam", make_movies(5))
+        self.assertEqual(
+            sorted(key for key in utils._storage.keys("catalog_") if ".page" in key),
+            sorted(utils.get_catalog_page_key("malayalam", 0, encoding) for encoding in utils.available_encodings()),
+        )
+
+    def test_whole_catalog_responses_are_dropped_when_pagination_is_turned_on(self):
+        with mock.patch.object(utils, "CATALOG_PAGE_SIZE", 0):
+            utils.save_cache("malayalam", make_movies(25))
+        self.assertIsNotNone(utils.load_catalog_response("malayalam", "gzip"))
+
+        utils.save_cache("malayalam", make_movies(25))
+        self.assertIsNone(utils._storage.read(utils.get_catalog_response_key("malayalam")))
+        self.assertIsNone(utils._storage.read(utils.get_catalog_response_key("malayalam", "gzip")))
+
+
+class ManifestTest(CatalogTestCase):
+    def test_saved_config_changes_the_manifest(self):
+        status, headers, body = get(manifest.handler, "/manifest.json")
+        self.assertEqual(status, 200)
+        self.assertNotIn("Last-Modified", headers)
+        status, _, _ = get(manifest.handler, "/manifest.json", If_None_Match=headers["ETag"])
+        self.assertEqual(status, 304)
+
+        utils.write_json(utils.get_config_key(), {"enabled_languages": ["malayalam", "hindi"]})
+        # If-Modified-Since alone cannot tell the config changed
+        status, _, changed = get(manifest.handler, "/manifest.json", If_Modified_Since="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(utils.json_loads(changed)["catalogs"]), 2)
+        status, _, _ = get(manifest.handler, "/manifest.json", If_None_Match=headers["ETag"])
+        self.assertEqual(status, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
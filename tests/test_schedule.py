@@ -0,0 +1,58 @@
+"""Refresh schedule tests for the cron evaluator behind the catalog Cache-Control.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import utils  # noqa: E402
+
+# A Sunday
+NOW = datetime(2026, 10, 18, 10, 7, 30, tzinfo=timezone.utc)
+
+
+def at(day, hour=0, minute=0):
+    return datetime(2026, 10, day, hour, minute, tzinfo=timezone.utc)
+
+
+class NextCronRunTest(unittest.TestCase):
+    def assertNextRun(self, schedule, expected):
+        self.assertEqual(utils.next_cron_run(schedule, NOW), expected)
+
+    def test_daily(self):
+        self.assertNextRun("0 0 * * *", at(19))
+        self.assertNextRun("30 10 * * *", at(18, 10, 30))
+
+    def test_steps(self):
+        self.assertNextRun("*/15 * * * *", at(18, 10, 15))
+        self.assertNextRun("0 */6 * * *", at(18, 12))
+        self.assertNextRun("0 0 */10 * *", at(21))
+
+    def test_weekdays(self):
+        self.assertNextRun("30 2 * * 1", at(19, 2, 30))
+        self.assertNextRun("30 2 * * MON", at(19, 2, 30))
+        self.assertNextRun("0 9 * * fri-sat", at(23, 9))
+        self.assertNextRun("0 0 * * 7", at(25))
+        self.assertNextRun("0 0 1 Nov *", datetime(2026, 11, 1, tzinfo=timezone.utc))
+
+    def test_restricted_day_of_month_and_weekday_either_match(self):
+        self.assertNextRun("0 0 20 * FRI", at(20))
+        self.assertNextRun("0 0 30 * FRI", at(23))
+
+    def test_starred_step_must_match_as_well(self):
+        # Odd days that are Fridays, not odd days or Fridays
+        self.assertNextRun("0 0 */2 * FRI", at(23))
+        self.assertNextRun("0 0 */2 * SAT", datetime(2026, 10, 31, tzinfo=timezone.utc))
+
+    def test_named_schedule_is_used_for_the_catalog_max_age(self):
+        with mock.patch.object(utils, "get_refresh_schedule", return_value="0 0 * * MON"):
+            self.assertNotEqual(utils.seconds_until_next_refresh(), 86400)
+
+
+if __name__ == "__main__":
+    unittest.main()
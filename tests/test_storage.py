@@ -0,0 +1,215 @@
+"""Storage backend tests; Redis runs against a local stand-in speaking its protocol.
+
+    python -m unittest discover tests
+"""
+import fnmatch
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import utils  # noqa: E402
+
+
+class StandInRedis(socketserver.StreamRequestHandler):
+    """The commands ``RedisStorage`` sends: GET, SET [NX] [PX], INCR(BY), DEL and SCAN"""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            with self.server.lock:
+                self.wfile.write(self.encode(self.execute(args[0].upper().decode(), args[1:])))
+
+    def execute(self, command, args):
+        data, expires = self.server.data, self.server.expires
+        for key in [key for key, at in expires.items() if at <= time.monotonic()]:
+            data.pop(key, None)
+            expires.pop(key)
+        if command == "HELLO":
+            return {b"server": b"redis", b"version": b"7.0.0", b"proto": 3}
+        if command == "CLIENT":
+            return "OK"
+        if command == "GET":
+            return data.get(args[0])
+        if command == "SET":
+            options = [arg.upper() for arg in args[2:]]
+            if b"NX" in options and args[0] in data:
+                return None
+            data[args[0]] = args[1]
+            expires.pop(args[0], None)
+            if b"PX" in options:
+                expires[args[0]] = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+            return "OK"
+        if command in ("INCR", "INCRBY"):
+            data[args[0]] = b"%d" % (int(data.get(args[0], b"0")) + (int(args[1]) if len(args) > 1 else 1))
+            return int(data[args[0]])
+        if command == "DEL":
+            return sum(data.pop(key, None) is not None for key in args)
+        if command == "SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode() if b"MATCH" in args else "*"
+            return [b"0", [key for key in data if fnmatch.fnmatchcase(key.decode(), pattern)]]
+        return ValueError(f"unknown command {command}")
+
+    def encode(self, value):
+        if value is None:
+            return b"_\r\n"
+        if value == "OK":
+            return b"+OK\r\n"
+        if isinstance(value, Exception):
+            return b"-ERR %s\r\n" % str(value).encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, dict):
+            return b"%%%d\r\n" % len(value) + b"".join(self.encode(k) + self.encode(v) for k, v in value.items())
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self.encode(item) for item in value)
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class StandInRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInRedis)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.expires = {}
+
+
+class StorageTests:
+    """Behaviour every backend shares; ``make_storage`` returns an empty one"""
+
+    def setUp(self):
+        self.storage = self.make_storage()
+
+    def test_read_write_delete(self):
+        self.assertIsNone(self.storage.read("movies.json"))
+        self.storage.write("movies.json", b"[1]")
+        self.assertEqual(self.storage.read("movies.json"), b"[1]")
+        self.storage.delete("movies.json")
+        self.assertIsNone(self.storage.read("movies.json"))
+        self.storage.delete("movies.json")
+
+    def test_version_changes_with_every_write(self):
+        self.assertIsNone(self.storage.version("catalog.json"))
+        self.storage.write("catalog.json", b"a")
+        first = self.storage.version("catalog.json")
+        time.sleep(0.01)
+        self.storage.write("catalog.json", b"bb")
+        self.assertIsNotNone(first)
+        self.assertNotEqual(self.storage.version("catalog.json"), first)
+        self.storage.delete("catalog.json")
+        self.assertIsNone(self.storage.version("catalog.json"))
+
+    def test_keys_by_prefix(self):
+        for key in ("movies_cache_ml_1.json", "movies_cache_ml_2.json", "movies_cache_hi_1.json"):
+            self.storage.write(key, b"[]")
+        self.assertEqual(
+            sorted(self.storage.keys("movies_cache_ml_")), ["movies_cache_ml_1.json", "movies_cache_ml_2.json"]
+        )
+
+    def test_lease_is_exclusive_until_released(self):
+        token = self.storage.acquire_lease("refresh.lease", 60)
+        self.assertIsNotNone(token)
+        self.assertIsNone(self.storage.acquire_lease("refresh.lease", 60))
+        self.storage.release_lease("refresh.lease", "not-the-holder")
+        self.assertIsNone(self.storage.acquire_lease("refresh.lease", 60))
+        self.storage.release_lease("refresh.lease", token)
+        self.assertIsNotNone(self.storage.acquire_lease("refresh.lease", 60))
+
+    def test_expired_lease_can_be_taken(self):
+        self.assertIsNotNone(self.storage.acquire_lease("refresh.lease", 0.2))
+        self.assertIsNone(self.storage.acquire_lease("refresh.lease", 60))
+        time.sleep(0.3)
+        # Expiry follows the ttl the holder took the lease with
+        self.assertIsNotNone(self.storage.acquire_lease("refresh.lease", 60))
+
+    def test_one_of_many_contenders_breaks_an_expired_lease(self):
+        self.assertIsNotNone(self.storage.acquire_lease("cold_fetch.lease", 0.1))
+        time.sleep(0.2)
+        start = threading.Barrier(8)
+        tokens = []
+
+        def contend():
+            storage = self.make_contender()
+            start.wait()
+            tokens.append(storage.acquire_lease("cold_fetch.lease", 60))
+
+        threads = [threading.Thread(target=contend) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(token is not None for token in tokens), 1)
+
+    def make_contender(self):
+        """Another handle on the same storage, as a separate process would have"""
+        return self.storage
+
+
+class FileStorageTest(StorageTests, unittest.TestCase):
+    def make_storage(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return utils.FileStorage(directory.name)
+
+    def make_contender(self):
+        return utils.FileStorage(self.storage.directory)
+
+    def test_failed_write_keeps_previous_contents(self):
+        self.storage.write("movies.json", b"old")
+        with self.assertRaises(TypeError):
+            self.storage.write("movies.json", "not bytes")
+        self.assertEqual(self.storage.read("movies.json"), b"old")
+        self.assertEqual(os.listdir(self.storage.directory), ["movies.json"])
+
+    def test_unreadable_lease_counts_as_expired(self):
+        self.storage.write("refresh.lease", b"token-only")
+        self.assertIsNotNone(self.storage.acquire_lease("refresh.lease", 60))
+
+
+class SQLiteStorageTest(StorageTests, unittest.TestCase):
+    def make_storage(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return utils.SQLiteStorage(os.path.join(directory.name, "storage.db"))
+
+
+@unittest.skipIf(utils.redis is None, "the redis package is not installed")
+class RedisStorageTest(StorageTests, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInRedisServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def make_storage(self):
+        with self.server.lock:
+            self.server.data.clear()
+            self.server.expires.clear()
+        host, port = self.server.server_address
+        return utils.RedisStorage(f"redis://{host}:{port}/0", prefix="test:")
+
+    def test_keys_are_prefixed(self):
+        self.storage.write("movies.json", b"[]")
+        self.assertIn(b"test:movies.json", self.server.data)
+        self.assertEqual(self.storage.keys("movies"), ["movies.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,455 @@
+"""Crawl tests against a local stand-in for the TMDB API.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import utils  # noqa: E402
+
+PAGE_SIZE = 5
+PAGES = 3
+MOVIE_IDS = list(range(1000, 1000 + PAGE_SIZE * PAGES))
+
+
+def release_date(movie_id):
+    """Newest first, like discover sorted by release_date.desc"""
+    return f"2024-{12 - (movie_id - 1000) // 2:02d}-{28 - (movie_id - 1000) % 2 * 10:02d}"
+
+
+def has_offer(movie_id):
+    return movie_id % 5 != 0
+
+
+def imdb_id(movie_id):
+    return None if movie_id % 7 == 0 else f"tt{movie_id:07d}"
+
+
+class StandInTMDB(BaseHTTPRequestHandler):
+    """Serves discover pages and per-movie details, counting requests per endpoint.
+
+    ``failing`` maps a path (or a discover path with ``?page=N``) to the
+    status it answers with on every attempt, or to a list of statuses
+    answered in turn before it succeeds. Throttled responses carry
+    ``retry_after``; ``discover_queries`` collects the query of every
+    discover request.
+    """
+
+    requests = Counter()
+    failing = {}
+    retry_after = "0"
+    discover_queries = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+        with self.lock:
+            if parts[0] == "discover":
+                self.requests["discover"] += 1
+                self.discover_queries.append({name: values[0] for name, values in query.items()})
+            elif len(parts) == 2:
+                self.requests["movie"] += 1
+            else:
+                self.requests[parts[2]] += 1
+        for failing in (url.path, f"{url.path}?page={query.get('page', [''])[0]}"):
+            with self.lock:
+                status = self.failing.get(failing)
+                if isinstance(status, list):
+                    status = status.pop(0) if status else None
+            if status:
+                return self.reply(status, {"status_message": "failing"})
+
+        if parts[0] == "discover":
+            page = int(query["page"][0])
+            ids = MOVIE_IDS[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+            return self.reply(200, {
+                "page": page,
+                "total_pages": PAGES,
+                "results": [
+                    {"id": movie_id, "title": f"Movie {movie_id}", "release_date": release_date(movie_id),
+                     "poster_path": f"/{movie_id}.jpg", "overview": "..."}
+                    for movie_id in ids
+                ],
+            })
+
+        movie_id = int(parts[1])
+        providers = {"results": {"IN": {"flatrate": [{"provider_id": 8}]}} if has_offer(movie_id) else {}}
+        external_ids = {"imdb_id": imdb_id(movie_id)}
+        if len(parts) == 2:
+            return self.reply(200, {"id": movie_id, "watch/providers": providers, "external_ids": external_ids})
+        if parts[2] == "watch":
+            return self.reply(200, providers)
+        return self.reply(200, external_ids)
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", self.retry_after)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TMDBTestCase(unittest.TestCase):
+    """Points the crawler at the stand-in and at a private storage directory"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInTMDB)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        StandInTMDB.requests.clear()
+        StandInTMDB.failing = {}
+        StandInTMDB.retry_after = "0"
+        StandInTMDB.discover_queries = []
+        for patcher in (
+            mock.patch.object(utils, "TMDB_BASE_URL", self.base_url),
+            mock.patch.object(utils, "TMDB_MAX_RETRIES", 1),
+            mock.patch.object(utils, "tmdb_rate_limiter", utils.TokenBucket(1000)),
+            mock.patch.object(utils, "_backoff_seconds", lambda attempt: 0),
+            mock.patch.object(utils, "_storage", utils.FileStorage(directory.name)),
+            mock.patch.object(utils, "MOVIE_STORE_ENABLED", False),
+            mock.patch.dict(os.environ, {"STORAGE_DIR": directory.name}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fetch(self, **kwargs):
+        kwargs.setdefault("discover", "all")
+        return utils.fetch_movies_for_language("malayalam", "key", **kwargs)
+
+
+def expected_imdb_ids():
+    return [imdb_id(movie_id) for movie_id in MOVIE_IDS if has_offer(movie_id) and imdb_id(movie_id)]
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_requests_are_spaced_at_the_rate(self):
+        bucket = utils.TokenBucket(20, capacity=1)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 20 - 0.01)
+
+    def test_pause_does_not_refill_the_bucket(self):
+        bucket = utils.TokenBucket(10)
+        bucket.pause(0.3)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        # Released at the rate once the pause is over, not as one burst
+        self.assertGreaterEqual(time.monotonic() - start, 0.3 + 2 / 10 - 0.01)
+
+
+class ThrottledRequestTest(TMDBTestCase):
+    def test_retry_after_pauses_every_request(self):
+        StandInTMDB.failing = {"/movie/1000": [429]}
+        StandInTMDB.retry_after = "0.3"
+        start = time.monotonic()
+        response = utils.tmdb_request("/movie/1000", {}, "key")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StandInTMDB.requests["movie"], 2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+
+    def test_last_throttled_response_is_returned(self):
+        StandInTMDB.failing = {"/movie/1000": [429, 429]}
+        response = utils.tmdb_request("/movie/1000", {}, "key")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(StandInTMDB.requests["movie"], utils.TMDB_MAX_RETRIES + 1)
+
+
+class EnrichmentModeTest(TMDBTestCase):
+    def test_append_uses_one_request_per_movie(self):
+        stats = {}
+        movies = self.fetch(enrichment="append", stats=stats)
+
+        self.assertEqual([movie["imdb_id"] for movie in movies], expected_imdb_ids())
+        self.assertEqual(StandInTMDB.requests["movie"], len(MOVIE_IDS))
+        self.assertEqual(StandInTMDB.requests["watch"] + StandInTMDB.requests["external_ids"], 0)
+        self.assertEqual(stats["movie_requests"], len(MOVIE_IDS))
+
+    def test_separate_uses_two_requests_per_offered_movie(self):
+        stats = {}
+        movies = self.fetch(enrichment="separate", stats=stats)
+
+        offered = sum(1 for movie_id in MOVIE_IDS if has_offer(movie_id))
+        self.assertEqual([movie["imdb_id"] for movie in movies], expected_imdb_ids())
+        self.assertEqual(StandInTMDB.requests["watch"], len(MOVIE_IDS))
+        self.assertEqual(StandInTMDB.requests["external_ids"], offered)
+        self.assertEqual(StandInTMDB.requests["movie"], 0)
+        self.assertEqual(stats["movie_requests"], len(MOVIE_IDS) + offered)
+
+    def test_modes_return_the_same_movies(self):
+        appended = self.fetch(enrichment="append")
+        # Start the second crawl with empty enrichment caches
+        for key in (utils.get_enrichment_cache_key(), utils.get_negative_cache_key()):
+            utils.delete_key(key)
+        separate = self.fetch(enrichment="separate")
+
+        self.assertEqual(appended, separate)
+
+
+class OTTDiscoverTest(TMDBTestCase):
+    def test_discover_filters_on_flatrate_offers(self):
+        self.fetch(discover="ott", watch_providers="8|119")
+
+        self.assertEqual(len(StandInTMDB.discover_queries), PAGES)
+        for query in StandInTMDB.discover_queries:
+            self.assertEqual(query["watch_region"], "IN")
+            self.assertEqual(query["with_watch_monetization_types"], "flatrate")
+            self.assertEqual(query["with_watch_providers"], "8|119")
+
+    def test_each_movie_costs_one_external_ids_request(self):
+        stats = {}
+        movies = self.fetch(discover="ott", enrichment="append", stats=stats)
+
+        # TMDB already filtered on offers, so no providers are requested
+        self.assertEqual(StandInTMDB.requests["external_ids"], len(MOVIE_IDS))
+        self.assertEqual(StandInTMDB.requests["movie"] + StandInTMDB.requests["watch"], 0)
+        self.assertEqual(stats["movie_requests"], len(MOVIE_IDS))
+        self.assertEqual(
+            [movie["imdb_id"] for movie in movies],
+            [imdb_id(movie_id) for movie_id in MOVIE_IDS if imdb_id(movie_id)],
+        )
+
+    def test_no_flatrate_rejections_are_ignored(self):
+        unoffered, unlinked = MOVIE_IDS[0], next(m for m in MOVIE_IDS if not imdb_id(m))
+        utils.write_json(utils.get_negative_cache_key(), {
+            str(unoffered): {"reason": "no_flatrate", "release_date": release_date(unoffered),
+                             "checked_at": time.time()},
+            str(unlinked): {"reason": "no_imdb_id", "release_date": release_date(unlinked),
+                            "checked_at": time.time()},
+        })
+        stats = {}
+        movies = self.fetch(discover="ott", stats=stats)
+
+        self.assertIn(imdb_id(unoffered), [movie["imdb_id"] for movie in movies])
+        self.assertEqual(stats["negative_cache_skips"], 1)
+        self.assertEqual(StandInTMDB.requests["external_ids"], len(MOVIE_IDS) - 1)
+
+
+class SharedCacheTest(TMDBTestCase):
+    def test_crawl_keeps_entries_written_since_it_loaded_the_caches(self):
+        now = time.time()
+        # Written by another crawl after this one loaded its (empty) copies
+        utils.write_json(utils.get_enrichment_cache_key(), {"1": {"imdb_id": "tt0000001", "used_at": now}})
+        utils.write_json(utils.get_negative_cache_key(), {
+            "2": {"reason": "no_imdb_id", "release_date": "2024-01-01", "checked_at": now},
+        })
+        with mock.patch.object(utils, "load_enrichment_cache", return_value={}), \
+                mock.patch.object(utils, "load_negative_cache", return_value={}):
+            self.fetch()
+
+        enrichment = utils.read_json(utils.get_enrichment_cache_key())
+        negative = utils.read_json(utils.get_negative_cache_key())
+        self.assertIn("1", enrichment)
+        self.assertIn("2", negative)
+        self.assertTrue(set(map(str, MOVIE_IDS)) <= set(enrichment))
+        self.assertIn(str(next(m for m in MOVIE_IDS if not has_offer(m))), negative)
+
+    def test_expired_entries_are_pruned(self):
+        old = time.time() - utils.ENRICHMENT_CACHE_MAX_AGE - 1
+        utils.write_json(utils.get_enrichment_cache_key(), {"1": {"imdb_id": "tt0000001", "used_at": old}})
+        utils.write_json(utils.get_negative_cache_key(), {
+            "2": {"reason": "no_imdb_id", "release_date": "2024-01-01", "checked_at": 0},
+        })
+        self.fetch()
+
+        self.assertNotIn("1", utils.read_json(utils.get_enrichment_cache_key()))
+        self.assertNotIn("2", utils.read_json(utils.get_negative_cache_key()))
+
+
+
+class MovieStoreEnrichmentTest(TMDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = utils.MovieStore(os.path.join(utils._storage.directory, "movies.db"))
+        for patcher in (
+            mock.patch.object(utils, "MOVIE_STORE_ENABLED", True),
+            mock.patch.object(utils, "_movie_store", self.store),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_crawl_writes_and_reads_store_enrichment(self):
+        self.fetch()
+        stored = self.store.load_enrichment(MOVIE_IDS)
+        self.assertEqual(stored[str(MOVIE_IDS[2])]["imdb_id"], imdb_id(MOVIE_IDS[2]))
+        self.assertIs(stored[str(MOVIE_IDS[0])]["has_flatrate"], has_offer(MOVIE_IDS[0]))
+
+        # Without the shared JSON caches the store still answers every lookup
+        for key in (utils.get_enrichment_cache_key(), utils.get_negative_cache_key()):
+            utils.delete_key(key)
+        StandInTMDB.requests.clear()
+        stats = {}
+        movies = self.fetch(stats=stats)
+
+        # Only titles without an IMDb ID are looked up again
+        self.assertEqual(stats["movie_requests"], sum(1 for m in MOVIE_IDS if has_offer(m) and not imdb_id(m)))
+        self.assertEqual([movie["imdb_id"] for movie in movies], expected_imdb_ids())
+
+    def test_store_entries_win_over_the_json_cache(self):
+        movie_id = MOVIE_IDS[2]
+        utils.write_json(utils.get_enrichment_cache_key(), {
+            str(movie_id): {"imdb_id": "tt9999999", "used_at": time.time()},
+        })
+        self.store.save_enrichment({str(movie_id): {"imdb_id": "tt1234567", "used_at": time.time()}})
+        movies = self.fetch(discover="ott")
+
+        self.assertIn("tt1234567", [movie["imdb_id"] for movie in movies])
+        self.assertNotIn("tt9999999", [movie["imdb_id"] for movie in movies])
+
+    def test_unused_store_entries_expire(self):
+        old = time.time() - utils.ENRICHMENT_CACHE_MAX_AGE - 1
+        self.store.save_enrichment({"1": {"imdb_id": "tt0000001", "used_at": old}})
+        self.store.save_enrichment({"2": {"imdb_id": "tt0000002", "used_at": time.time()}})
+
+        self.assertEqual(list(self.store.load_enrichment([1, 2])), ["2"])
+
+
+class FailedRequestTest(TMDBTestCase):
+    def test_throttled_movies_are_neither_rejected_nor_cached(self):
+        throttled = MOVIE_IDS[:3]
+        StandInTMDB.failing = {f"/movie/{movie_id}": 429 for movie_id in throttled}
+        stats = {}
+        movies = self.fetch(stats=stats)
+
+        self.assertEqual(stats["movie_errors"], len(throttled))
+        self.assertFalse({movie["id"] for movie in movies} & set(throttled))
+        enrichment = utils.read_json(utils.get_enrichment_cache_key())
+        negative = utils.read_json(utils.get_negative_cache_key())
+        for movie_id in throttled:
+            self.assertNotIn(str(movie_id), enrichment)
+            self.assertNotIn(str(movie_id), negative)
+
+        # The next crawl checks them again
+        StandInTMDB.failing = {}
+        StandInTMDB.requests.clear()
+        movies = self.fetch()
+        self.assertEqual(StandInTMDB.requests["movie"], len(throttled))
+        self.assertEqual([movie["imdb_id"] for movie in movies], expected_imdb_ids())
+
+    def test_unknown_movie_is_rejected(self):
+        missing = MOVIE_IDS[1]
+        StandInTMDB.failing = {f"/movie/{missing}": 404}
+        stats = {}
+        self.fetch(stats=stats)
+
+        self.assertEqual(stats["movie_errors"], 0)
+        self.assertEqual(
+            utils.read_json(utils.get_negative_cache_key())[str(missing)]["reason"], "no_flatrate"
+        )
+
+
+
+class IncrementalRefreshTest(TMDBTestCase):
+    def setUp(self):
+        super().setUp()
+        for patcher in (
+            # Every title of the stand-in falls inside the re-checked overlap
+            mock.patch.object(utils, "INCREMENTAL_OVERLAP_DAYS", 3650),
+            mock.patch.object(utils, "TMDB_DISCOVER_MODE", "all"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def refresh(self, mode):
+        stats = {}
+        utils.refresh_language("malayalam", "key", mode, stats)
+        return stats
+
+    def test_failed_page_keeps_its_cached_titles(self):
+        self.refresh("full")
+        cached = [movie["imdb_id"] for movie in utils.load_cache("malayalam")]
+
+        StandInTMDB.failing = {"/discover/movie?page=2": 500}
+        stats = self.refresh("incremental")
+
+        self.assertEqual(stats["failed_pages"], [2])
+        self.assertTrue(stats["incomplete"])
+        self.assertEqual([movie["imdb_id"] for movie in utils.load_cache("malayalam")], cached)
+
+    def test_incomplete_full_refresh_is_not_recorded(self):
+        StandInTMDB.failing = {f"/movie/{MOVIE_IDS[0]}": 503}
+        stats = self.refresh("full")
+
+        self.assertTrue(stats["incomplete"])
+        self.assertNotIn("last_full_sync", utils.load_sync_state("malayalam"))
+
+
+
+class StreamingTest(TMDBTestCase):
+    def test_pages_are_scheduled_a_window_ahead_of_the_consumer(self):
+        with mock.patch.object(utils, "TMDB_PAGE_WINDOW", 1):
+            movies = utils.iter_movies_for_language("malayalam", "key", discover="all")
+            next(movies)
+            self.assertLessEqual(StandInTMDB.requests["discover"], 2)
+            rest = list(movies)
+
+        self.assertEqual(StandInTMDB.requests["discover"], PAGES)
+        self.assertEqual(len(rest) + 1, len(expected_imdb_ids()))
+
+    def test_refresh_resumes_from_progress_saved_while_crawling(self):
+        class Killed(Exception):
+            pass
+
+        save_checkpoint = utils.save_refresh_checkpoint
+
+        def save_then_die(languages, checkpoint):
+            save_checkpoint(languages, checkpoint)
+            if checkpoint.get("next_page") == PAGES:
+                raise Killed()
+
+        with mock.patch.object(utils, "REFRESH_PROGRESS_INTERVAL", 0), \
+                mock.patch.object(utils, "TMDB_DISCOVER_MODE", "all"):
+            with mock.patch.object(utils, "save_refresh_checkpoint", save_then_die):
+                with self.assertRaises(Killed):
+                    utils.refresh_languages(["malayalam"], "key")
+            checkpoint = utils.load_refresh_checkpoint(["malayalam"])
+            self.assertEqual(checkpoint["next_page"], PAGES)
+            self.assertEqual(checkpoint["fields"], list(utils.MOVIE_RECORD_FIELDS))
+            self.assertEqual(len(checkpoint["rows"]), len([
+                movie_id for movie_id in MOVIE_IDS[:PAGE_SIZE * (PAGES - 1)]
+                if has_offer(movie_id) and imdb_id(movie_id)
+            ]))
+
+            StandInTMDB.requests.clear()
+            result = utils.refresh_languages(["malayalam"], "key")
+            cached = utils.load_cache("malayalam")
+
+        self.assertEqual(result["status"], "complete")
+        self.assertEqual(StandInTMDB.requests["discover"], 1)
+        self.assertEqual(sorted(movie["imdb_id"] for movie in cached), sorted(expected_imdb_ids()))
+
+
+if __name__ == "__main__":
+    unittest.main()